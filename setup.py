@@ -33,13 +33,16 @@ setup(
         'svgwrite >= 1.4.0',
         'xmltodict >= 0.12.0',
         'numpy >= 1.22.3',
-        'typeguard >= 2.13.3',
-        'IPython >= 7.23.1',
+        'typeguard >= 2.13.3, < 3',
         'typing >= 3.7'
     ],
     extras_require = {
         'dev': [
-            'pytest >= 7.1'
+            'pytest >= 7.1',
+            'IPython >= 7.23.1'
+        ],
+        'notebook': [
+            'IPython >= 7.23.1'
         ],
     },
     include_package_data = True,
@@ -1,13 +1,79 @@
-import svgwrite
-import xmltodict
-import numpy as np
-from svgwrite import mm
+from __future__ import annotations
+
+import heapq
+import io
+import operator
+import os
+from importlib import import_module
 from typeguard import typechecked
-from IPython.display import display
-from importlib.metadata import distribution
-from typing import Final, List, Dict, TypeVar, Type, Sequence
+from collections import OrderedDict, deque
+from functools import lru_cache, wraps
+from types import MappingProxyType
+from typing import Final, List, Dict, Optional, TypeVar, Type, Sequence, Union
+
+# Heavy modules are imported on first use (Rendering or exporting)
+class _LazyModule(object):
+    def __init__(self, name: str) -> None:
+        self._name = name
+        self._module = None
+    
+    def __getattr__(self, attr: str):
+        if self._module is None:
+            self._module = import_module(self._name)
+        return getattr(self._module, attr)
+
+# Runtime type checks (typeguard) of the classes and functions on the hot paths, they are skipped in production mode
+class _TypeChecks(object):
+    def __init__(self, enabled: bool) -> None:
+        self._enabled = enabled
+        self._classes = []
+    
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+    
+    @enabled.setter
+    def enabled(self, v: bool) -> None:
+        self._enabled = v
+        for entry in self._classes:
+            self._apply(entry)
+    
+    # Swap the methods of a class between the raw and the checked versions (The checked versions are created once)
+    def _apply(self, entry: list) -> None:
+        cls, raw, checked = entry
+        if self._enabled and checked is None:
+            before = dict(cls.__dict__)
+            typechecked(cls)
+            checked = entry[2] = {k: v for k, v in cls.__dict__.items() if before.get(k) is not v}
+            raw = entry[1] = {k: before[k] for k in checked}
+        for k, v in ((checked or {}) if self._enabled else raw).items():
+            setattr(cls, k, v)
+    
+    def __call__(self, obj):
+        if isinstance(obj, type):
+            entry = [obj, {}, None]
+            self._classes.append(entry)
+            if self._enabled:
+                self._apply(entry)
+            return obj
+        
+        checked = []
+        @wraps(obj)
+        def dispatch(*args, **kwargs):
+            if not self._enabled:
+                return obj(*args, **kwargs)
+            if not checked:
+                checked.append(typechecked(obj))
+            return checked[0](*args, **kwargs)
+        return dispatch
+
+_typechecked = _TypeChecks(os.environ.get('PYACPTRAK_PRODUCTION', '').lower() not in ('1', 'true', 'yes', 'on'))
+
+np = _LazyModule('numpy')
+svgwrite = _LazyModule('svgwrite')
+xmltodict = _LazyModule('xmltodict')
 
-version = distribution('pyacptrak').version
+__all__ = ['Segment', 'Track', 'Loop', 'Assembly', 'set_option', 'get_class_elements', 'render_many', 'render_cache_info', 'render_cache_clear', 'loop_capacity']
 
 _TSegment = TypeVar("_TSegment", bound = "Segment")
 _TTrack = TypeVar("_TTrack", bound = "Track")
@@ -24,6 +90,12 @@ class _Config(object):
     def __init__(self):
         self.gap: float = 0.5
         self.devMode: bool = False
+        self.render_cache: int = 0
+        self.svg_symbols: bool = False
+        self.svg_precision: Optional[int] = None
+        self.svg_paths: bool = False
+        self.svg_backend: str = 'string'
+        self.production: bool = not _typechecked.enabled
         
     def __str__(self):
         return get_class_elements(self)
@@ -44,6 +116,59 @@ class _Config(object):
     @devMode.setter
     def devMode(self, v: bool):
         self._devMode = v
+    
+    @property
+    def render_cache(self):
+        return self._render_cache
+
+    @render_cache.setter
+    def render_cache(self, v: int):
+        if v < 0: raise Exception('The value must be a positive integer (0 disables the render cache)')
+        self._render_cache = v
+    
+    @property
+    def svg_symbols(self):
+        return self._svg_symbols
+
+    @svg_symbols.setter
+    def svg_symbols(self, v: bool):
+        self._svg_symbols = v
+    
+    @property
+    def svg_precision(self):
+        return self._svg_precision
+
+    @svg_precision.setter
+    def svg_precision(self, v: Optional[int]):
+        if v is not None and not (0 <= v <= 12): raise Exception('The value must be between [0, 12] (None keeps all the decimals)')
+        self._svg_precision = v
+    
+    @property
+    def svg_paths(self):
+        return self._svg_paths
+
+    @svg_paths.setter
+    def svg_paths(self, v: bool):
+        self._svg_paths = v
+    
+    @property
+    def production(self):
+        return self._production
+
+    @production.setter
+    def production(self, v: bool):
+        self._production = v
+        _typechecked.enabled = not v
+    
+    @property
+    def svg_backend(self):
+        return self._svg_backend
+
+    @svg_backend.setter
+    def svg_backend(self, v: str):
+        _backends = ['string', 'svgwrite']
+        if v.lower() not in _backends: raise Exception(f'The SVG backend is not valid, please configure one of the following values: {_backends}')
+        self._svg_backend = v.lower()
 
 # Define global configuration variable
 _config = _Config()
@@ -67,294 +192,677 @@ def set_option(variable :str, value) -> None:
     if hasattr(_config, variable):
         setattr(_config, variable, value)
 
-# Segment class
-@typechecked
-class Segment(object):
-    def __init__(self, s: str) -> None:
-        self._s = s.lower()
+# Write a SVG image (Including the XML declaration) into a file path or a file object, emit(write) writes the image in pieces
+def _write_svg(emit, target) -> None:
+    if isinstance(target, (str, os.PathLike)):
+        with open(target, 'w', encoding='utf-8') as f:
+            _write_svg(emit, f)
+        return
+    
+    write = target.write if isinstance(target, io.TextIOBase) else (lambda text: target.write(text.encode('utf-8')))
+    write('<?xml version="1.0" encoding="utf-8" ?>\n')
+    emit(write)
+
+# Configuration values that change the rendered SVG images
+def _render_options() -> tuple:
+    return (_config.gap, _config.svg_symbols, _config.svg_precision, _config.svg_paths, _config.svg_backend)
+
+# Bounded LRU cache of rendered SVG images, the maximum size is configured with set_option('render_cache', n)
+class _RenderCache(object):
+    def __init__(self):
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key: tuple, render):
+        maxsize = _config.render_cache
+        while len(self._data) > maxsize:
+            self._data.popitem(last=False)
         
-        # Segment AA
-        if (self._s == 'aa'):
-            self._info = {
-                'name': None,
-                'id': None,
-                'node': None,
-                'length': 660,
-                'type': '8F1I01.AA66.xxxx-1',
-                'description': 'ACOPOStrak straight segment'
-            }
+        if maxsize == 0:
+            return render()
+        
+        svg = self._data.get(key)
+        if svg is not None:
+            self.hits += 1
+            self._data.move_to_end(key)
+            return svg
+        
+        self.misses += 1
+        svg = self._data[key] = render()
+        if len(self._data) > maxsize:
+            self._data.popitem(last=False)
+        return svg
+    
+    def clear(self) -> None:
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
 
-            self._svg = {
-                            'w': 66.0,
-                            'h': 10.074,
-                            'rs': 0.0,
-                            're': 0.0,
-                            'svg': {
-                                'body': {
-                                    'points' : [[16.624056, 0.496246],
-                                                [24.812025, 0.496246],
-                                                [32.999993, 0.496246],
-                                                [41.187961, 0.496246],
-                                                [49.375929, 0.496246],
-                                                [57.563898, 0.496246],
-                                                [65.751866, 0.496246],
-                                                [65.751866, 9.8255674],
-                                                [0.24812, 9.8255674],
-                                                [0.24812, 0.496246],
-                                                [8.4360882, 0.496246]],
-                                    'fill': '#eeeeee',
-                                    'stroke': '#a9a9a9',
-                                    'stroke_width': 0.492512,
-                                },
-                                'border': {
-                                    'points': [[0.24812, 0.4962459999999993],
-                                               [8.43608825, 0.4962459999999993],
-                                               [16.6240565, 0.4962459999999993],
-                                               [24.81202475, 0.4962459999999993],
-                                               [32.999992999999996, 0.4962459999999993],
-                                               [41.187961249999994, 0.4962459999999993],
-                                               [49.3759295, 0.4962459999999993],
-                                               [57.563897749999995, 0.4962459999999993],
-                                               [65.75186599999999, 0.4962459999999993]],
-                                    'fill': '#eeeeee',
-                                    'stroke': '#ff8800',
-                                    'stroke_width': 0.985023,
-                                },
-                                'direction': {
-                                    'points': [[2.233082, 2.3621103],
-                                               [2.233082, 7.9597031],
-                                               [4.218044, 5.1609067]],
-                                    'fill': '#cccccc',
-                                    'stroke': '#cccccc',
-                                    'stroke_width': 0,
-                                }
-                            }
-                        }
-            
-        # Segment AB
-        elif (self._s == 'ab'):
-            self._info = {
-                'name': None,
-                'id': None,
-                'node': None,
-                'length': 450,
-                'type': '8F1I01.AB2B.xxxx-1',
-                'description': 'ACOPOStrak curve segment A'
-            }
+# Define global render cache variable
+_render_cache = _RenderCache()
 
-            self._svg = {
-                            'w': 44.6,
-                            'h': 12.523,
-                            'rs': 0.0,
-                            're': 22.5,
-                            'svg': {
-                                'body': {
-                                    'points' : [[27.98617, 0.69384411],
-                                                [33.517333, 1.1193844],
-                                                [38.986245, 2.0383348],
-                                                [44.269779, 3.7118311],
-                                                [40.726738, 12.266472],
-                                                [0.246234, 9.7518438],
-                                                [0.246234, 0.492402],
-                                                [5.7947334, 0.492402],
-                                                [11.343331, 0.492402],
-                                                [16.891831, 0.4965392],
-                                                [22.440133, 0.5363351]],
-                                    'fill': '#eeeeee',
-                                    'stroke': '#a9a9a9',
-                                    'stroke_width': 0.492512,
-                                },
-                                'border': {
-                                    'points': [[0.24623400000000117, 0.49240199999999845],
-                                               [5.794733367000006, 0.49240199999999845],
-                                               [11.343331233900003, 0.49240199999999845],
-                                               [16.891830600899993, 0.4965391973999971],
-                                               [22.440132968099988, 0.5363350961999913],
-                                               [27.986169837600002, 0.6938441114999989],
-                                               [33.51733322220001, 1.1193844154999937],
-                                               [38.98624466999999, 2.0383347618000016],
-                                               [44.269779306000004, 3.7118311100999932]],
-                                    'fill': '#eeeeee',
-                                    'stroke': '#ff8800',
-                                    'stroke_width': 0.985023,
-                                },
-                                'direction': {
-                                    'points': [[2.216232, 2.3442904],
-                                               [2.216232, 7.8999554],
-                                               [4.18623, 5.1221229]],
-                                    'fill': '#cccccc',
-                                    'stroke': '#cccccc',
-                                    'stroke_width': 0,
-                                }
-                            }
-                        }
-            
-        # Segment BA
-        elif (self._s == 'ba'):
-            self._info = {
-                'name': None,
-                'id': None,
-                'node': None,
-                'length': 450,
-                'type': '8F1I01.BA2B.xxxx-1',
-                'description': 'ACOPOStrak curve segment B'
-            }
+@typechecked
+def render_cache_info() -> Dict[str, int]:
+    return {
+        'hits': _render_cache.hits,
+        'misses': _render_cache.misses,
+        'maxsize': _config.render_cache,
+        'currsize': len(_render_cache._data),
+    }
 
-            self._svg = {
-                            'w': 44.6,
-                            'h': 12.523,
-                            'rs': 22.5,
-                            're': 0.0,
-                            'svg': {
-                                'body': {
-                                    'points' : [[22.159756, 0.53639704],
-                                                [27.70807, 0.496603],
-                                                [33.25658, 0.492466],
-                                                [38.80516, 0.492466],
-                                                [44.3537, 0.492466],
-                                                [44.3537, 9.7514754],
-                                                [3.8734094, 12.265986],
-                                                [0.33016381, 3.7117448],
-                                                [5.6139062, 2.0383266],
-                                                [11.082533, 1.1194191],
-                                                [16.613708, 0.6938987]],
-                                    'fill': '#eeeeee',
-                                    'stroke': '#a9a9a9',
-                                    'stroke_width': 0.492512,
-                                },
-                                'border': {
-                                    'points': [[0.3301638061000034, 3.711744768300008],
-                                               [5.613906170299998, 2.038326569399999],
-                                               [11.082533222199999, 1.1194191364999995],
-                                               [16.613707837600003, 0.6938987045000005],
-                                               [22.159755968100004, 0.5363970445999939],
-                                               [27.708069600900004, 0.49660300419999714],
-                                               [33.2565802339, 0.4924660000000074],
-                                               [38.805159816970004, 0.4924660000000074],
-                                               [44.35369999999996, 0.4924660000000074]],
-                                    'fill': '#eeeeee',
-                                    'stroke': '#ff8800',
-                                    'stroke_width': 0.985023,
-                                },
-                                'direction': {
-                                    'points': [[2.8588584, 4.6686732],
-                                               [4.984786, 9.801218],
-                                               [5.7418578, 6.4810751]],
-                                    'fill': '#cccccc',
-                                    'stroke': '#cccccc',
-                                    'stroke_width': 0,
-                                }
-                            }
-                        }
-            
-        # Segment BB
-        elif (self._s == 'bb'):
-            self._info = {
-                'name': None,
-                'id': None,
-                'node': None,
-                'length': 240,
-                'type': '8F1I01.BB4B.xxxx-1',
-                'description': 'ACOPOStrak circular arc segment'
+@typechecked
+def render_cache_clear() -> None:
+    _render_cache.clear()
+
+# Recursively convert nested dictionaries and lists into read-only mappings and tuples
+def _freeze(obj):
+    if isinstance(obj, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in obj.items()})
+    elif isinstance(obj, (list, tuple)):
+        return tuple(_freeze(v) for v in obj)
+    return obj
+
+# Segment catalog, the geometry and information of each segment type is shared (read-only) by all Segment objects
+_SEGMENT_CATALOG: Final = _freeze({
+    # Segment AA
+    'aa': {
+        'info': {
+            'length': 660,
+            'type': '8F1I01.AA66.xxxx-1',
+            'description': 'ACOPOStrak straight segment'
+        },
+        'svg': {
+            'w': 66.0,
+            'h': 10.074,
+            'rs': 0.0,
+            're': 0.0,
+            'svg': {
+                'body': {
+                    'points' : [[16.624056, 0.496246],
+                                [24.812025, 0.496246],
+                                [32.999993, 0.496246],
+                                [41.187961, 0.496246],
+                                [49.375929, 0.496246],
+                                [57.563898, 0.496246],
+                                [65.751866, 0.496246],
+                                [65.751866, 9.8255674],
+                                [0.24812, 9.8255674],
+                                [0.24812, 0.496246],
+                                [8.4360882, 0.496246]],
+                    'fill': '#eeeeee',
+                    'stroke': '#a9a9a9',
+                    'stroke_width': 0.492512,
+                },
+                'border': {
+                    'points': [[0.24812, 0.4962459999999993],
+                               [8.43608825, 0.4962459999999993],
+                               [16.6240565, 0.4962459999999993],
+                               [24.81202475, 0.4962459999999993],
+                               [32.999992999999996, 0.4962459999999993],
+                               [41.187961249999994, 0.4962459999999993],
+                               [49.3759295, 0.4962459999999993],
+                               [57.563897749999995, 0.4962459999999993],
+                               [65.75186599999999, 0.4962459999999993]],
+                    'fill': '#eeeeee',
+                    'stroke': '#ff8800',
+                    'stroke_width': 0.985023,
+                },
+                'direction': {
+                    'points': [[2.233082, 2.3621103],
+                               [2.233082, 7.9597031],
+                               [4.218044, 5.1609067]],
+                    'fill': '#cccccc',
+                    'stroke': '#cccccc',
+                    'stroke_width': 0,
+                }
+            }
+        }
+    },
+    # Segment AB
+    'ab': {
+        'info': {
+            'length': 450,
+            'type': '8F1I01.AB2B.xxxx-1',
+            'description': 'ACOPOStrak curve segment A'
+        },
+        'svg': {
+            'w': 44.6,
+            'h': 12.523,
+            'rs': 0.0,
+            're': 22.5,
+            'svg': {
+                'body': {
+                    'points' : [[27.98617, 0.69384411],
+                                [33.517333, 1.1193844],
+                                [38.986245, 2.0383348],
+                                [44.269779, 3.7118311],
+                                [40.726738, 12.266472],
+                                [0.246234, 9.7518438],
+                                [0.246234, 0.492402],
+                                [5.7947334, 0.492402],
+                                [11.343331, 0.492402],
+                                [16.891831, 0.4965392],
+                                [22.440133, 0.5363351]],
+                    'fill': '#eeeeee',
+                    'stroke': '#a9a9a9',
+                    'stroke_width': 0.492512,
+                },
+                'border': {
+                    'points': [[0.24623400000000117, 0.49240199999999845],
+                               [5.794733367000006, 0.49240199999999845],
+                               [11.343331233900003, 0.49240199999999845],
+                               [16.891830600899993, 0.4965391973999971],
+                               [22.440132968099988, 0.5363350961999913],
+                               [27.986169837600002, 0.6938441114999989],
+                               [33.51733322220001, 1.1193844154999937],
+                               [38.98624466999999, 2.0383347618000016],
+                               [44.269779306000004, 3.7118311100999932]],
+                    'fill': '#eeeeee',
+                    'stroke': '#ff8800',
+                    'stroke_width': 0.985023,
+                },
+                'direction': {
+                    'points': [[2.216232, 2.3442904],
+                               [2.216232, 7.8999554],
+                               [4.18623, 5.1221229]],
+                    'fill': '#cccccc',
+                    'stroke': '#cccccc',
+                    'stroke_width': 0,
+                }
+            }
+        }
+    },
+    # Segment BA
+    'ba': {
+        'info': {
+            'length': 450,
+            'type': '8F1I01.BA2B.xxxx-1',
+            'description': 'ACOPOStrak curve segment B'
+        },
+        'svg': {
+            'w': 44.6,
+            'h': 12.523,
+            'rs': 22.5,
+            're': 0.0,
+            'svg': {
+                'body': {
+                    'points' : [[22.159756, 0.53639704],
+                                [27.70807, 0.496603],
+                                [33.25658, 0.492466],
+                                [38.80516, 0.492466],
+                                [44.3537, 0.492466],
+                                [44.3537, 9.7514754],
+                                [3.8734094, 12.265986],
+                                [0.33016381, 3.7117448],
+                                [5.6139062, 2.0383266],
+                                [11.082533, 1.1194191],
+                                [16.613708, 0.6938987]],
+                    'fill': '#eeeeee',
+                    'stroke': '#a9a9a9',
+                    'stroke_width': 0.492512,
+                },
+                'border': {
+                    'points': [[0.3301638061000034, 3.711744768300008],
+                               [5.613906170299998, 2.038326569399999],
+                               [11.082533222199999, 1.1194191364999995],
+                               [16.613707837600003, 0.6938987045000005],
+                               [22.159755968100004, 0.5363970445999939],
+                               [27.708069600900004, 0.49660300419999714],
+                               [33.2565802339, 0.4924660000000074],
+                               [38.805159816970004, 0.4924660000000074],
+                               [44.35369999999996, 0.4924660000000074]],
+                    'fill': '#eeeeee',
+                    'stroke': '#ff8800',
+                    'stroke_width': 0.985023,
+                },
+                'direction': {
+                    'points': [[2.8588584, 4.6686732],
+                               [4.984786, 9.801218],
+                               [5.7418578, 6.4810751]],
+                    'fill': '#cccccc',
+                    'stroke': '#cccccc',
+                    'stroke_width': 0,
+                }
+            }
+        }
+    },
+    # Segment BB
+    'bb': {
+        'info': {
+            'length': 240,
+            'type': '8F1I01.BB4B.xxxx-1',
+            'description': 'ACOPOStrak circular arc segment'
+        },
+        'svg': {
+            'w': 23.2,
+            'h': 13.081,
+            'rs': 22.5,
+            're': 22.5,
+            'svg': {
+                'body': {
+                    'points' : [[14.488988, 0.62517295],
+                                [17.351025, 1.0496071],
+                                [20.156149, 1.7528172],
+                                [22.880244, 2.7270865],
+                                [18.690886, 12.840194],
+                                [4.508613, 12.840194],
+                                [0.3197376, 2.7270865],
+                                [3.0433506, 1.7528172],
+                                [5.8493425, 1.0496071],
+                                [8.7107037, 0.62517295],
+                                [11.599942, 0.48337337]],
+                    'fill': '#eeeeee',
+                    'stroke': '#a9a9a9',
+                    'stroke_width': 0.492512,
+                },
+                'border': {
+                    'points': [[0.31973760030000165, 2.72708646400001],
+                               [3.0433506408, 1.7528172340000054],
+                               [5.849342485500003, 1.0496070670000108],
+                               [8.710703690399995, 0.6251729469999958],
+                               [11.599942499999997, 0.48337336600000924],
+                               [14.488988384999999, 0.6251729469999958],
+                               [17.351024826000014, 1.0496070670000108],
+                               [20.15614851000001, 1.7528172340000054],
+                               [22.880243861999986, 2.72708646400001]],
+                    'fill': '#eeeeee',
+                    'stroke': '#ff8800',
+                    'stroke_width': 0.985023,
+                },
+                'direction': {
+                    'points': [[5.4532683, 10.079443],
+                               [5.9789878, 6.307767],
+                               [2.9398466, 4.0119643]],
+                    'fill': '#cccccc',
+                    'stroke': '#cccccc',
+                    'stroke_width': 0,
+                }
             }
+        }
+    }
+})
 
-            self._svg = {
-                            'w': 23.2,
-                            'h': 13.081,
-                            'rs': 22.5,
-                            're': 22.5,
-                            'svg': {
-                                'body': {
-                                    'points' : [[14.488988, 0.62517295],
-                                                [17.351025, 1.0496071],
-                                                [20.156149, 1.7528172],
-                                                [22.880244, 2.7270865],
-                                                [18.690886, 12.840194],
-                                                [4.508613, 12.840194],
-                                                [0.3197376, 2.7270865],
-                                                [3.0433506, 1.7528172],
-                                                [5.8493425, 1.0496071],
-                                                [8.7107037, 0.62517295],
-                                                [11.599942, 0.48337337]],
-                                    'fill': '#eeeeee',
-                                    'stroke': '#a9a9a9',
-                                    'stroke_width': 0.492512,
-                                },
-                                'border': {
-                                    'points': [[0.31973760030000165, 2.72708646400001],
-                                               [3.0433506408, 1.7528172340000054],
-                                               [5.849342485500003, 1.0496070670000108],
-                                               [8.710703690399995, 0.6251729469999958],
-                                               [11.599942499999997, 0.48337336600000924],
-                                               [14.488988384999999, 0.6251729469999958],
-                                               [17.351024826000014, 1.0496070670000108],
-                                               [20.15614851000001, 1.7528172340000054],
-                                               [22.880243861999986, 2.72708646400001]],
-                                    'fill': '#eeeeee',
-                                    'stroke': '#ff8800',
-                                    'stroke_width': 0.985023,
-                                },
-                                'direction': {
-                                    'points': [[5.4532683, 10.079443],
-                                               [5.9789878, 6.307767],
-                                               [2.9398466, 4.0119643]],
-                                    'fill': '#cccccc',
-                                    'stroke': '#cccccc',
-                                    'stroke_width': 0,
-                                }
-                            }
-                        }
-        
-        else:
-            raise ValueError('Segment not supported. Supported segments "AA", "AB", "BA" or "BB"')
+# Segment type codes, the code of each segment type is its index in the catalog
+_SEG_TYPES: Final = tuple(_SEGMENT_CATALOG)
+_SEG_CODE: Final = MappingProxyType({s: i for i, s in enumerate(_SEG_TYPES)})
+
+# Space between the tracks of an assembly stacked from top to bottom
+_ASM_SPACING: Final = 10.0
+
+# Segment catalog geometry as NumPy arrays indexed by the segment type code
+@lru_cache(maxsize=None)
+def _seg_table():
+    svg = [_SEGMENT_CATALOG[s]['svg'] for s in _SEG_TYPES]
+    return {
+        'w': np.array([t['w'] for t in svg]),
+        'h': np.array([t['h'] for t in svg]),
+        'rs': np.array([t['rs'] for t in svg]),
+        're': np.array([t['re'] for t in svg]),
+        'tl': np.array([t['svg']['border']['points'][0] for t in svg]),
+        'tr': np.array([t['svg']['border']['points'][-1] for t in svg]),
+        'length': np.array([_SEGMENT_CATALOG[s]['info']['length'] for s in _SEG_TYPES]),
+    }
+
+# Extents (xmin, ymin, xmax, ymax) of all the shapes of each segment type rotated by an angle plus each of the 16 heading steps (22.5°),
+# the rows are indexed by heading step * 4 + segment code
+@lru_cache(maxsize=256)
+def _shape_extents(angle: float) -> np.ndarray:
+    shapes = [np.concatenate([np.asarray(shape['points'], dtype=float) for shape in _SEGMENT_CATALOG[s]['svg']['svg'].values()]) for s in _SEG_TYPES]
+    size = max(len(p) for p in shapes)
+    pts = np.stack([np.concatenate((p, np.repeat(p[:1], size - len(p), axis=0))) for p in shapes])
+    a = np.deg2rad(angle + (np.arange(16) * 22.5))[:, None, None]
+    x = (pts[None, :, :, 0] * np.cos(a)) - (pts[None, :, :, 1] * np.sin(a))
+    y = (pts[None, :, :, 0] * np.sin(a)) + (pts[None, :, :, 1] * np.cos(a))
+    ext = np.stack((x.min(axis=2), y.min(axis=2), x.max(axis=2), y.max(axis=2)), axis=2).reshape(64, 4)
+    ext.flags.writeable = False
+    return ext
+
+# Convex hull (Counterclockwise) of all the shapes of each segment type [Drawing units], padded to the same number of vertices by repeating
+# the last vertex (A repeated vertex is an edge of length 0)
+@lru_cache(maxsize=None)
+def _seg_hulls() -> np.ndarray:
+    def half(points):
+        chain = []
+        for p in points:
+            while len(chain) >= 2 and ((chain[-1][0] - chain[-2][0]) * (p[1] - chain[-2][1])) - ((chain[-1][1] - chain[-2][1]) * (p[0] - chain[-2][0])) <= 0:
+                chain.pop()
+            chain.append(p)
+        return chain
+    
+    hulls = []
+    for s in _SEG_TYPES:
+        points = sorted(set(tuple(p) for shape in _SEGMENT_CATALOG[s]['svg']['svg'].values() for p in np.asarray(shape['points'], dtype=float).tolist()))
+        hulls.append(half(points)[:-1] + half(points[::-1])[:-1])
+    size = max(len(h) for h in hulls)
+    hulls = np.array([h + ([h[-1]] * (size - len(h))) for h in hulls])
+    hulls.flags.writeable = False
+    return hulls
+
+# Minimum distance from the points of each polygon P to the edges of the polygon Q of the same pair (Arrays of pairs, vertices and x/y)
+def _point_edge_distance(P: np.ndarray, Q: np.ndarray) -> np.ndarray:
+    E = np.roll(Q, -1, axis=1) - Q
+    d = P[:, :, None, :] - Q[:, None, :, :]
+    t = np.clip((d * E[:, None, :, :]).sum(axis=3) / np.maximum((E * E).sum(axis=2), 1e-12)[:, None, :], 0, 1)
+    r = d - (t[..., None] * E[:, None, :, :])
+    return np.sqrt((r * r).sum(axis=3)).min(axis=(1, 2))
+
+# Heading steps (22.5°) at the start and the end of each segment type and the chord [mm] from its start to its end point, relative to the
+# heading before the segment (The validation of the tracks counts steps exactly instead of adding angles)
+@lru_cache(maxsize=None)
+def _seg_steps():
+    geo = _seg_table()
+    rs = np.rint(geo['rs'] / 22.5).astype(np.int64)
+    re = np.rint(geo['re'] / 22.5).astype(np.int64)
+    d = (geo['tr'] - geo['tl']) * 10
+    c = np.cos(np.deg2rad(geo['rs']))
+    s = np.sin(np.deg2rad(geo['rs']))
+    return rs, re, np.stack(((d[:, 0] * c) - (d[:, 1] * s), (d[:, 0] * s) + (d[:, 1] * c)), axis=1)
+
+# Heading [°] of each segment type along its normalized length u, from -rs at the start to +re at the end. AA is straight and BB
+# is a circular arc, the curve segments AB/BA have a straight part and a transition curve whose heading grows with the cube of the distance
+_CURVE_SAMPLES: Final = 512
+_CURVE_STRAIGHT: Final = 0.25
+_CURVE_PROFILE: Final = {
+    'aa': lambda u, rs, re: np.zeros_like(u),
+    'ab': lambda u, rs, re: re * np.clip((u - _CURVE_STRAIGHT) / (1 - _CURVE_STRAIGHT), 0, None)**3,
+    'ba': lambda u, rs, re: -rs * np.clip((1 - u - _CURVE_STRAIGHT) / (1 - _CURVE_STRAIGHT), 0, None)**3,
+    'bb': lambda u, rs, re: -rs + ((rs + re) * u),
+}
+
+# Lookup table of the curve (x, y and heading) of each segment type, integrated from the heading profile and mapped onto the border of the segment
+@lru_cache(maxsize=None)
+def _curve_table():
+    geo = _seg_table()
+    u = np.linspace(0.0, 1.0, _CURVE_SAMPLES + 1)
+    x = np.empty((len(_SEG_TYPES), len(u)))
+    y = np.empty((len(_SEG_TYPES), len(u)))
+    heading = np.empty((len(_SEG_TYPES), len(u)))
+    for code, t in enumerate(_SEG_TYPES):
+        h = _CURVE_PROFILE[t](u, geo['rs'][code], geo['re'][code])
+        d = np.exp(1j * np.deg2rad(h))
+        p = np.concatenate(([0], np.cumsum((d[1:] + d[:-1]) / 2)))
         
+        # Similarity transformation from the integrated curve to the start and end of the segment border
+        tl = complex(*geo['tl'][code])
+        tr = complex(*geo['tr'][code])
+        m = (tr - tl) / (p[-1] - p[0])
+        p = tl + ((p - p[0]) * m)
+        x[code], y[code] = p.real, p.imag
+        heading[code] = h + np.rad2deg(np.angle(m))
+    
+    # The samples of all segment types are stored one after the other, base is the first sample of each segment type
+    return {
+        'x': x.ravel(),
+        'y': y.ravel(),
+        'heading': heading.ravel(),
+        'base': np.arange(len(_SEG_TYPES)) * len(u),
+        'scale': _CURVE_SAMPLES / geo['length'],
+    }
+
+# Time [s] of a move of d [mm] from standstill to standstill with the stereotype limits (Trapezoidal profile plus the jerk filter time)
+def _move_time(d: float, shuttle) -> float:
+    par = shuttle.stereotype_par
+    v = par.velocity * 1000
+    a = par.acceleration * 1000
+    b = par.deceleration * 1000
+    ramps = (v * v / (2 * a)) + (v * v / (2 * b))
+    if d >= ramps:
+        t = (v / a) + (v / b) + ((d - ramps) / v)
+    else:
+        peak = np.sqrt(2 * d * a * b / (a + b))
+        t = (peak / a) + (peak / b)
+    return float(t) + par.jerk
+
+# Round a coordinate to the configured SVG precision, digits is the rounding used when the precision is not configured
+def _q(v: float, digits: int = None) -> float:
+    precision = _config.svg_precision
+    if precision is not None:
+        digits = precision if digits is None else min(digits, precision)
+    return v if digits is None else round(v, digits)
+
+# Format a number for the SVG path data (Without trailing ".0")
+def _num(v: float) -> str:
+    text = repr(float(v) + 0.0)
+    return text[:-2] if text.endswith('.0') else text
+
+# Points of a segment shape for the SVG output, rounded to the precision or compacted into path data (First point absolute, the rest relative)
+@lru_cache(maxsize=None)
+def _shape_data(s: str, shape: str, precision: int = None, path: bool = False):
+    points = _SEGMENT_CATALOG[s]['svg']['svg'][shape]['points']
+    if precision is not None:
+        points = tuple((round(x, precision), round(y, precision)) for x, y in points)
+    if not path:
+        return points
+    
+    deltas = []
+    for (x0, y0), (x1, y1) in zip(points[:-1], points[1:]):
+        dx, dy = x1 - x0, y1 - y0
+        if precision is not None:
+            dx, dy = round(dx, precision), round(dy, precision)
+        deltas.append(f'{_num(dx)},{_num(dy)}')
+    
+    # The body and direction shapes are polygons (Closed paths) and the border is a polyline (Open path)
+    close = 'z' if shape != 'border' else ''
+    return f'M{_num(points[0][0])},{_num(points[0][1])}l' + ' '.join(deltas) + close
+
+# Style of the segment id text
+def _id_style(seg_id_fill: str = None, seg_id_stroke: str = None, seg_id_stroke_width: float = None) -> str:
+    seg_id_fill = '#bbbbbb' if seg_id_fill is None else seg_id_fill
+    seg_id_stroke = '#bbbbbb' if seg_id_stroke is None else seg_id_stroke
+    seg_id_stroke_width = 0.15 if seg_id_stroke_width is None else seg_id_stroke_width
+    
+    return f'font-size:5;font-family:Arial;font-weight:none;fill:{seg_id_fill};stroke:{seg_id_stroke};stroke-width:{seg_id_stroke_width};text-anchor:middle;dominant-baseline:middle'
+
+# Tag and attributes of the shapes (Body, border and direction) of a segment type
+@lru_cache(maxsize=256)
+def _shape_attribs(s: str, seg_body_fill: str = None, seg_body_stroke: str = None, seg_border_stroke: str = None, seg_dir_fill: str = None, seg_dir_stroke: str = None, precision: int = None, path: bool = False) -> tuple:
+    constructor = _SEGMENT_CATALOG[s]['svg']
+    
+    seg_body_fill = constructor['svg']['body']['fill'] if seg_body_fill is None else seg_body_fill
+    seg_body_stroke = constructor['svg']['body']['stroke'] if seg_body_stroke is None else seg_body_stroke
+    seg_body_stroke_width = constructor['svg']['body']['stroke_width']
+    
+    seg_border_fill = constructor['svg']['body']['fill'] if seg_body_fill is None else seg_body_fill
+    seg_border_stroke = constructor['svg']['border']['stroke'] if seg_border_stroke is None else seg_border_stroke
+    seg_border_stroke_width = constructor['svg']['border']['stroke_width']
+    
+    seg_dir_fill = constructor['svg']['direction']['fill'] if seg_dir_fill is None else seg_dir_fill
+    seg_dir_stroke = constructor['svg']['direction']['stroke'] if seg_dir_stroke is None else seg_dir_stroke
+    seg_dir_stroke_width = constructor['svg']['direction']['stroke_width']
+    
+    # Each shape could be a polygon/polyline or a path with relative coordinates
+    if path:
+        tags = (('path', 'd'), ('path', 'd'), ('path', 'd'))
+    else:
+        tags = (('polygon', 'points'), ('polyline', 'points'), ('polygon', 'points'))
+    
+    return (
+        (tags[0][0], ((tags[0][1], _shape_data(s, 'body', precision, path)), ('fill', seg_body_fill), ('stroke', seg_body_stroke), ('stroke_width', seg_body_stroke_width))),
+        (tags[1][0], ((tags[1][1], _shape_data(s, 'border', precision, path)), ('fill', seg_border_fill), ('stroke', seg_border_stroke), ('stroke_width', seg_border_stroke_width))),
+        (tags[2][0], ((tags[2][1], _shape_data(s, 'direction', precision, path)), ('fill', seg_dir_fill), ('stroke', seg_dir_stroke), ('stroke_width', seg_dir_stroke_width))),
+    )
+
+# Escape the special characters of a XML attribute value or text (Like ElementTree)
+def _escape(text: str, attrib: bool = True) -> str:
+    text = text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+    if attrib:
+        text = text.replace('"', '&quot;').replace('\r', '&#13;').replace('\n', '&#10;').replace('\t', '&#09;')
+    return text
+
+# Serialize a XML element, the attributes are sorted by name and the empty attributes are skipped (Like svgwrite)
+def _xml(tag: str, attribs, content: str = '') -> str:
+    items = []
+    for key, value in sorted((k.rstrip('_').replace('_', '-'), v) for k, v in dict(attribs).items()):
+        if value is None:
+            continue
+        value = ' '.join('%s,%s' % point for point in value) if key == 'points' else str(value)
+        if value:
+            items.append(f' {key}="{_escape(value)}"')
+    attribs = ''.join(items)
+    return f'<{tag}{attribs}>{content}</{tag}>' if content else f'<{tag}{attribs} />'
+
+# Serialized shapes of a segment type for the string backend
+@lru_cache(maxsize=256)
+def _shapes_xml(s: str, seg_body_fill: str = None, seg_body_stroke: str = None, seg_border_stroke: str = None, seg_dir_fill: str = None, seg_dir_stroke: str = None, precision: int = None, path: bool = False) -> str:
+    return ''.join(_xml(tag, attribs) for tag, attribs in _shape_attribs(s, seg_body_fill, seg_body_stroke, seg_border_stroke, seg_dir_fill, seg_dir_stroke, precision, path))
+
+# SVG backend that builds the elements with svgwrite (Every attribute is validated)
+class _SvgwriteBackend(object):
+    def header(self, profile: str, viewbox: str, width: str, height: str, symbols: list = []) -> str:
+        dwg = svgwrite.Drawing(profile=profile, viewBox=viewbox, size=(width, height))
+        for seg, styles in symbols:
+            sym = svgwrite.container.Symbol(id=f'symSeg_{seg._s}', overflow='visible')
+            for shape in seg._shapes(seg._svg, *styles):
+                sym.add(shape)
+            dwg.defs.add(sym)
         
-    def _group(self, constructor, angle: float = 0, show_id: bool = False, seg_body_fill: str = None, seg_body_stroke: str = None, seg_border_stroke: str = None, seg_dir_fill: str = None, seg_dir_stroke: str = None, seg_id_fill: str = None, seg_id_stroke: str = None, seg_id_stroke_width: float = None):
-        # Get constructor variables
-        name = self._info['name'] if self._info['name'] is not None else 'gSeg_001'
+        # Header of the drawing without the closing tag
+        return dwg.tostring()[:-len('</svg>')]
+    
+    def group(self, seg, angle: float = 0, show_id: bool = False, seg_body_fill: str = None, seg_body_stroke: str = None, seg_border_stroke: str = None, seg_dir_fill: str = None, seg_dir_stroke: str = None, seg_id_fill: str = None, seg_id_stroke: str = None, seg_id_stroke_width: float = None, href: str = None, tx: float = 0, ty: float = 0, rot: float = 0) -> str:
+        g = seg._group(seg._svg, angle, show_id, seg_body_fill, seg_body_stroke, seg_border_stroke, seg_dir_fill, seg_dir_stroke, seg_id_fill, seg_id_stroke, seg_id_stroke_width, href)
+        g.translate(tx, ty)
+        g.rotate(rot)
+        return g.tostring()
+
+# SVG backend that writes the elements directly as strings (Same structure as the svgwrite backend)
+class _StringBackend(object):
+    def header(self, profile: str, viewbox: str, width: str, height: str, symbols: list = []) -> str:
+        defs = ''.join(_xml('symbol', {'id': f'symSeg_{seg._s}', 'overflow': 'visible'}, _shapes_xml(seg._s, *styles, _config.svg_precision, _config.svg_paths)) for seg, styles in symbols)
         
-        seg_body_points = constructor['svg']['body']['points']
-        seg_body_fill = constructor['svg']['body']['fill'] if seg_body_fill is None else seg_body_fill
-        seg_body_stroke = constructor['svg']['body']['stroke'] if seg_body_stroke is None else seg_body_stroke
-        seg_body_stroke_width = constructor['svg']['body']['stroke_width']
+        # Header of the drawing without the closing tag
+        return _xml('svg', {
+            'baseProfile': profile,
+            'height': height,
+            'version': '1.2' if profile == 'tiny' else '1.1',
+            'viewBox': viewbox,
+            'width': width,
+            'xmlns': 'http://www.w3.org/2000/svg',
+            'xmlns:ev': 'http://www.w3.org/2001/xml-events',
+            'xmlns:xlink': 'http://www.w3.org/1999/xlink',
+        }, _xml('defs', {}, defs))[:-len('</svg>')]
+    
+    def group(self, seg, angle: float = 0, show_id: bool = False, seg_body_fill: str = None, seg_body_stroke: str = None, seg_border_stroke: str = None, seg_dir_fill: str = None, seg_dir_stroke: str = None, seg_id_fill: str = None, seg_id_stroke: str = None, seg_id_stroke_width: float = None, href: str = None, tx: float = 0, ty: float = 0, rot: float = 0) -> str:
+        name = seg.name if seg.name is not None else 'gSeg_001'
+        style = _id_style(seg_id_fill, seg_id_stroke, seg_id_stroke_width)
+        transform = f'translate({tx},{ty}) rotate({rot})'
         
-        seg_border_points = constructor['svg']['border']['points']
-        seg_border_fill = constructor['svg']['body']['fill'] if seg_body_fill is None else seg_body_fill
-        seg_border_stroke = constructor['svg']['border']['stroke'] if seg_border_stroke is None else seg_border_stroke
-        seg_border_stroke_width = constructor['svg']['border']['stroke_width']
+        # The shapes could be drawn in the group or referenced from a symbol with the same shapes (The text style is then only added to the segment id)
+        if href is None:
+            attribs = {'id': name, 'style': style, 'transform': transform}
+            content = _shapes_xml(seg._s, seg_body_fill, seg_body_stroke, seg_border_stroke, seg_dir_fill, seg_dir_stroke, _config.svg_precision, _config.svg_paths)
+        else:
+            attribs = {'id': name, 'transform': transform}
+            content = _xml('use', {'xlink:href': href})
         
-        seg_dir_points = constructor['svg']['direction']['points']
-        seg_dir_fill = constructor['svg']['direction']['fill'] if seg_dir_fill is None else seg_dir_fill
-        seg_dir_stroke = constructor['svg']['direction']['stroke'] if seg_dir_stroke is None else seg_dir_stroke
-        seg_dir_stroke_width = constructor['svg']['direction']['stroke_width']
+        if show_id:
+            center = _q(seg._svg['w']/2)
+            middle = _q(seg._svg['h']/2)
+            text = {'transform': 'rotate(%s ,%s, %s)' % (_q(-angle), center, middle), 'x': center, 'y': middle}
+            if href is not None:
+                text['style'] = style
+            content += _xml('text', text, _escape(str(seg.id if seg.id is not None else '1'), False))
+        return _xml('g', attribs, content)
+
+# Available SVG backends, selected with set_option('svg_backend', name)
+_SVG_BACKENDS: Final = {
+    'string': _StringBackend(),
+    'svgwrite': _SvgwriteBackend(),
+}
+
+def _backend():
+    return _SVG_BACKENDS[_config.svg_backend]
+
+# Display the SVG image in the notebook (IPython is an optional dependency)
+def _display(svg: str) -> None:
+    try:
+        from IPython.display import display
+    except ImportError:
+        raise ImportError('IPython is required to plot the images, install it with: pip install pyacptrak[notebook]') from None
+    display({'image/svg+xml': svg}, raw=True)
+
+# Write the header of a drawing with the extents (xmin, ymin, xmax, ymax), each segment type used could be defined once as a symbol (Requires the full profile)
+def _write_header(write, backend, bounds: tuple, used: set, styles: tuple) -> None:
+    xmin, ymin, xmax, ymax = bounds
+    nw = (abs(xmax) + abs(xmin))
+    nh = (abs(ymax) + abs(ymin))
+    nx = abs(xmin)
+    ny = abs(ymin)
+    
+    symbols = _config.svg_symbols
+    viewbox = ','.join(str(v) for v in (_q(-nx), _q(-ny), _q(nw), _q(nh)))
+    defs = [(Segment(_SEG_TYPES[code]), styles) for code in sorted(used)] if symbols else []
+    write(backend.header('full' if symbols else 'tiny', viewbox, f'{_q(nw)}mm', f'{_q(nh)}mm', defs))
+
+# Segment class
+@_typechecked
+class Segment(object):
+    __slots__ = ('_s', 'name', 'id', 'node', '_plot_args')
+
+    def __init__(self, s: str) -> None:
+        if not isinstance(s, str):
+            raise TypeError('The segment type must be a string')
+        self._s = s.lower()
         
-        seg_id_fill = '#bbbbbb' if seg_id_fill is None else seg_id_fill
-        seg_id_stroke = '#bbbbbb' if seg_id_stroke is None else seg_id_stroke
-        seg_id_stroke_width = 0.15 if seg_id_stroke_width is None else seg_id_stroke_width
+        if self._s not in _SEGMENT_CATALOG:
+            raise ValueError('Segment not supported. Supported segments "AA", "AB", "BA" or "BB"')
         
-        style=f'font-size:5;font-family:Arial;font-weight:none;fill:{seg_id_fill};stroke:{seg_id_stroke};stroke-width:{seg_id_stroke_width};text-anchor:middle;dominant-baseline:middle'
+        self.name = None
+        self.id = None
+        self.node = None
+    
+    def _render_key(self) -> tuple:
+        return ('Segment', self._s, self.name, self.id)
+    
+    @property
+    def _info(self) -> Dict[str, any]:
+        return {'name': self.name, 'id': self.id, 'node': self.node, **_SEGMENT_CATALOG[self._s]['info']}
+    
+    @property
+    def _svg(self):
+        return _SEGMENT_CATALOG[self._s]['svg']
+    
+    def _shapes(self, constructor, seg_body_fill: str = None, seg_body_stroke: str = None, seg_border_stroke: str = None, seg_dir_fill: str = None, seg_dir_stroke: str = None) -> list:
+        shapes = []
+        for tag, attribs in _shape_attribs(self._s, seg_body_fill, seg_body_stroke, seg_border_stroke, seg_dir_fill, seg_dir_stroke, _config.svg_precision, _config.svg_paths):
+            attribs = dict(attribs)
+            if tag == 'path':
+                shapes.append(svgwrite.path.Path(attribs.pop('d'), **attribs))
+            elif tag == 'polygon':
+                shapes.append(svgwrite.shapes.Polygon(attribs.pop('points'), **attribs))
+            else:
+                shapes.append(svgwrite.shapes.Polyline(attribs.pop('points'), **attribs))
+        return shapes
+    
+    def _group(self, constructor, angle: float = 0, show_id: bool = False, seg_body_fill: str = None, seg_body_stroke: str = None, seg_border_stroke: str = None, seg_dir_fill: str = None, seg_dir_stroke: str = None, seg_id_fill: str = None, seg_id_stroke: str = None, seg_id_stroke_width: float = None, href: str = None):
+        name = self.name if self.name is not None else 'gSeg_001'
         
-        g = svgwrite.container.Group(id = name, style=style)
-        seg_body = svgwrite.shapes.Polygon(seg_body_points, fill=seg_body_fill, stroke=seg_body_stroke, stroke_width=seg_body_stroke_width)
-        seg_border = svgwrite.shapes.Polyline(seg_border_points, fill=seg_border_fill, stroke=seg_border_stroke, stroke_width=seg_border_stroke_width)
-        seg_dir = svgwrite.shapes.Polygon(seg_dir_points, fill=seg_dir_fill, stroke=seg_dir_stroke, stroke_width=seg_dir_stroke_width)
+        style = _id_style(seg_id_fill, seg_id_stroke, seg_id_stroke_width)
         
-        g.add(seg_body)
-        g.add(seg_border)
-        g.add(seg_dir)
+        # The shapes could be drawn in the group or referenced from a symbol with the same shapes (The text style is then only added to the segment id)
+        if href is None:
+            g = svgwrite.container.Group(id = name, style=style)
+            for shape in self._shapes(constructor, seg_body_fill, seg_body_stroke, seg_border_stroke, seg_dir_fill, seg_dir_stroke):
+                g.add(shape)
+        else:
+            g = svgwrite.container.Group(id = name)
+            g.add(svgwrite.container.Use(href))
         
         if show_id:
             rot = -angle
-            center = (constructor['w']/2)
-            middle = (constructor['h']/2)
-            seg_id = svgwrite.text.Text(self._info['id'] if self._info['id'] is not None else '1' , insert = (center, middle), transform = 'rotate(%s ,%s, %s)' % (rot, center, middle))
+            center = _q(constructor['w']/2)
+            middle = _q(constructor['h']/2)
+            seg_id = svgwrite.text.Text(self.id if self.id is not None else '1' , insert = (center, middle), transform = 'rotate(%s ,%s, %s)' % (_q(rot), center, middle))
+            if href is not None:
+                seg_id['style'] = style
             g.add(seg_id)
         return g
     
     def info(self) -> Dict[str, any]:
         return {k: v for k, v in self._info.items() if v is not None}
 
-    def plot(self, angle: float = 0, show_id: bool = False, seg_body_fill: str = None, seg_body_stroke: str = None, seg_border_stroke: str = None, seg_dir_fill: str = None, seg_dir_stroke: str = None, seg_id_fill: str = None, seg_id_stroke: str = None, seg_id_stroke_width: float = None) -> _TSegment:
+    def _write(self, write, angle: float = 0, show_id: bool = False, seg_body_fill: str = None, seg_body_stroke: str = None, seg_border_stroke: str = None, seg_dir_fill: str = None, seg_dir_stroke: str = None, seg_id_fill: str = None, seg_id_stroke: str = None, seg_id_stroke_width: float = None) -> None:
         # Limit angle between [0°, 360°)
         angle %= 360.0
         
@@ -370,32 +878,47 @@ class Segment(object):
         nx = (nw - ((w*np.cos(np.deg2rad(angle))) + (h*np.cos(np.deg2rad(90+angle)))).round(3))/2
         ny = (nh - ((w*np.sin(np.deg2rad(angle))) + (h*np.sin(np.deg2rad(90+angle)))).round(3))/2
         
-        # Create group
-        g = self._group(self._svg, angle, show_id, seg_body_fill, seg_body_stroke, seg_border_stroke, seg_dir_fill, seg_dir_stroke, seg_id_fill, seg_id_stroke, seg_id_stroke_width)
-        
-        # Apply translation and rotation to the group
-        g.translate(nx,ny)
-        g.rotate(angle)
+        # Write the drawing with the segment group translated and rotated
+        nw, nh = _q(nw), _q(nh)
+        backend = _backend()
+        write(backend.header('tiny', f'0 0 {nw} {nh}', f'{nw}mm', f'{nh}mm'))
+        write(backend.group(self, angle, show_id, seg_body_fill, seg_body_stroke, seg_border_stroke, seg_dir_fill, seg_dir_stroke, seg_id_fill, seg_id_stroke, seg_id_stroke_width, None, _q(nx), _q(ny), _q(angle)))
+        write('</svg>')
+    
+    def _render(self, *args) -> str:
+        key = (self._render_key(), _render_options(), args[0] % 360.0) + args[1:]
+        return _render_cache.get(key, lambda: self._to_string(*args))
+    
+    def _to_string(self, *args) -> str:
+        buffer = io.StringIO()
+        self._write(buffer.write, *args)
+        return buffer.getvalue()
+    
+    def to_svg(self, angle: float = 0, show_id: bool = False, seg_body_fill: str = None, seg_body_stroke: str = None, seg_border_stroke: str = None, seg_dir_fill: str = None, seg_dir_stroke: str = None, seg_id_fill: str = None, seg_id_stroke: str = None, seg_id_stroke_width: float = None) -> str:
+        return self._render(angle, show_id, seg_body_fill, seg_body_stroke, seg_border_stroke, seg_dir_fill, seg_dir_stroke, seg_id_fill, seg_id_stroke, seg_id_stroke_width)
+    
+    def render_to(self, target, angle: float = 0, show_id: bool = False, seg_body_fill: str = None, seg_body_stroke: str = None, seg_border_stroke: str = None, seg_dir_fill: str = None, seg_dir_stroke: str = None, seg_id_fill: str = None, seg_id_stroke: str = None, seg_id_stroke_width: float = None) -> None:
+        _write_svg(lambda write: write(self._render(angle, show_id, seg_body_fill, seg_body_stroke, seg_border_stroke, seg_dir_fill, seg_dir_stroke, seg_id_fill, seg_id_stroke, seg_id_stroke_width)), target)
+    
+    def plot(self, angle: float = 0, show_id: bool = False, seg_body_fill: str = None, seg_body_stroke: str = None, seg_border_stroke: str = None, seg_dir_fill: str = None, seg_dir_stroke: str = None, seg_id_fill: str = None, seg_id_stroke: str = None, seg_id_stroke_width: float = None) -> _TSegment:
+        svg = self._render(angle, show_id, seg_body_fill, seg_body_stroke, seg_border_stroke, seg_dir_fill, seg_dir_stroke, seg_id_fill, seg_id_stroke, seg_id_stroke_width)
         
-        # Create drawing and append the group
-        self._dwg = svgwrite.Drawing(profile='tiny', viewBox = f'0 0 {nw} {nh}', size = (nw*mm, nh*mm))
-        self._dwg.add(g)
+        # Keep the plot arguments (Not the drawing) so the image can be saved later
+        self._plot_args = (angle, show_id, seg_body_fill, seg_body_stroke, seg_border_stroke, seg_dir_fill, seg_dir_stroke, seg_id_fill, seg_id_stroke, seg_id_stroke_width)
         
         # Display the drawing
-        display(self._dwg)
+        _display(svg)
         
         return self
     
     def save(self, name: str = 'Segment.svg') -> None:
-        self._dwg.saveas(name)
+        self.render_to(name, *getattr(self, '_plot_args', ()))
     
     def __add__(self, other: _TST) -> _TTrack:
         if isinstance(other, Segment):
             return Track([self, other])
         elif isinstance(other, Track):
-            new_track = [self]
-            new_track += other.segment.copy()
-            return Track(new_track)
+            return Track._from_codes(np.insert(other._codes(), 0, np.uint8(_SEG_CODE[self._s])))
         else:
             raise TypeError('Segments can only be added to  Segment or Track objects')
     
@@ -403,145 +926,685 @@ class Segment(object):
         if isinstance(other, int):
             if other < 0:
                 raise TypeError('Segments can only be multiplied by positive integers')
-            l = list()
-            for i in range(other):
-                l.append(self.__class__(self._s))
-            return Track(l)
+            return Track._from_codes(np.full(other, _SEG_CODE[self._s], dtype=np.uint8))
         else:
             raise TypeError('Segments can only be multiplied by positive integers')
     
     __rmul__ = __mul__
     
+# Read-only sequence of the segments of a track, each Segment object (With its name and id) is created on access
+class _SegmentView(object):
+    __slots__ = ('_track',)
+    
+    def __init__(self, track: Track) -> None:
+        self._track = track
+    
+    def __len__(self) -> int:
+        return len(self._track)
+    
+    def _segment(self, i: int, code: int) -> Segment:
+        seg = Segment(_SEG_TYPES[code])
+        seg.name = self._track._name(i)
+        seg.id = self._track.seg_offset + i
+        return seg
+    
+    def __getitem__(self, i):
+        codes = self._track._codes()
+        if isinstance(i, slice):
+            return [self._segment(j, int(codes[j])) for j in range(*i.indices(len(codes)))]
+        i = operator.index(i)
+        if i < 0:
+            i += len(codes)
+        if not (0 <= i < len(codes)):
+            raise IndexError('Segment index out of range')
+        return self._segment(i, int(codes[i]))
+    
+    def __iter__(self):
+        for i, code in enumerate(self._track._codes().tolist()):
+            yield self._segment(i, code)
+    
+    def copy(self) -> List[Segment]:
+        return list(self)
+    
+    def __repr__(self) -> str:
+        return f'<{len(self)} segments of {self._track.seg_prefix!r}>'
+
 # Track class
-@typechecked
+@_typechecked
 class Track(object):
-    def __init__(self, segments: List[Segment], seg_prefix: str = 'gSeg_', seg_offset: int = 1):
-        if seg_offset < 0:
+    _closed = False
+    
+    def __init__(self, segments: Union[_SegmentView, Sequence[Segment]], seg_prefix: str = 'gSeg_', seg_offset: int = 1):
+        # The segments of another track are copied from its codes
+        if isinstance(segments, _SegmentView):
+            self._set_codes(segments._track._codes().copy(), seg_prefix, seg_offset)
+            return
+        if not all(isinstance(seg, Segment) for seg in segments):
+            raise TypeError('Tracks can only be created from Segment objects')
+        
+        self._set_codes(np.fromiter((_SEG_CODE[seg._s] for seg in segments), dtype=np.uint8, count=len(segments)), seg_prefix, seg_offset)
+    
+    # The track only keeps the segment type codes, the Segment objects (Name, id and info) are created on access
+    def _set_codes(self, codes: np.ndarray, seg_prefix: str = 'gSeg_', seg_offset: int = 1) -> None:
+        if not isinstance(seg_prefix, str):
+            raise TypeError('The "seg_prefix" argument must be a string')
+        if not isinstance(seg_offset, int) or seg_offset < 0:
             raise TypeError('The "seg_offset" argument must be a positive integer')
-
-        self.segment = [Segment(seg._s) for seg in segments]
+        
+        self._buf = codes
+        self._store = codes
+        self._cum = None
+        self._buckets = None
+        self._pose_cache = None
+        self._trig_cache = None
+        self._bbox_cache = None
         self.seg_prefix = seg_prefix
         self.seg_offset = seg_offset
-
-        for i, s in enumerate(self.segment):
-            s._info['name'] = self.seg_prefix + str(i + self.seg_offset).zfill(3)
-            s._info['id'] = self.seg_offset + i
-        
+    
+    @classmethod
+    def _from_codes(cls, codes: np.ndarray, seg_prefix: str = 'gSeg_', seg_offset: int = 1) -> Track:
+        track = Track.__new__(Track)
+        track._set_codes(codes, seg_prefix, seg_offset)
+        return track
+    
+    @property
+    def segment(self) -> _SegmentView:
+        return _SegmentView(self)
+    
     def __add__(self, other: _TST) -> _TTrack:
-        new_track = self.segment.copy()
         if isinstance(other, Segment):
-            new_track.append(other)
+            return Track._from_codes(np.append(self._codes(), np.uint8(_SEG_CODE[other._s])))
         elif isinstance(other, Track):
-            other_track = self.__class__(other.segment, other.seg_prefix, other.seg_offset)
-            new_track = new_track + other_track.segment
+            return Track._from_codes(np.concatenate((self._codes(), other._codes())))
         else:
             raise TypeError('Tracks can only be added to Segment or Track objects')
-        return Track(new_track)
     
     def __mul__(self, other: int) -> _TTrack:
         if isinstance(other, int):
             if other < 0:
                 raise TypeError('Tracks can only be multiplied by positive integers')
-            new_track = self.segment.copy()
-            new_track = new_track * other
-            return Track(new_track)
+            return Track._from_codes(np.tile(self._codes(), other))
         else:
             raise TypeError('Tracks can only be multiplied by positive integers')
     
+    # Appends segments and tracks in place, the codes are kept in a buffer that doubles its capacity when it is full so appending
+    # one item at a time takes amortized linear time instead of copying the whole track on each addition
+    def extend(self, *items: _TST) -> _TTrack:
+        if self._closed:
+            raise TypeError('Loops cannot be extended, add them to an assembly instead')
+        if not self._store.flags.writeable:
+            raise TypeError('The segments of this track are read-only (Prebuilt tracks and loop tracks), add them with + to create a new track')
+        
+        codes = []
+        for item in items:
+            if isinstance(item, Segment):
+                codes.append(np.full(1, _SEG_CODE[item._s], dtype=np.uint8))
+            elif isinstance(item, Track):
+                codes.append(item._codes())
+            else:
+                raise TypeError('Tracks can only be extended with Segment or Track objects')
+        
+        n = len(self._buf)
+        size = n + sum(len(c) for c in codes)
+        store = self._store
+        if size > len(store):
+            store = np.empty(max(size, 2 * len(store), 16), dtype=np.uint8)
+            store[:n] = self._buf
+        for c in codes:
+            store[n:n + len(c)] = c
+            n += len(c)
+        
+        # The prefix and offset do not change, only the codes and the cached geometry are replaced
+        self._buf = store[:size]
+        self._store = store
+        self._cum = None
+        self._buckets = None
+        self._pose_cache = None
+        self._trig_cache = None
+        self._bbox_cache = None
+        return self
+    
+    # Read-only tracks are not modified, += creates a new track like +
+    def __iadd__(self, other: _TST) -> _TTrack:
+        if not self._store.flags.writeable:
+            return self + other
+        return self.extend(other)
+    
     def __len__(self) -> int:
-        return len(self.segment)
+        return len(self._buf)
+    
+    # Cumulative length [mm] at the end of each segment, cached until the segments of the track change
+    def _cumlen(self) -> np.ndarray:
+        if self._cum is None:
+            self._cum = np.cumsum(_seg_table()['length'][self._codes()])
+            self._buckets = None
+        return self._cum
+    
+    # Index of the segment at the start of each bucket of the track, the buckets are not longer than the shortest segment so each bucket
+    # contains at most one segment end (The segment of a position is found with a lookup and one correction instead of a binary search)
+    def _bucket_index(self) -> tuple:
+        cum = self._cumlen()
+        if self._buckets is None:
+            size = float(_seg_table()['length'][np.unique(self._codes())].min())
+            first = np.searchsorted(cum, np.arange(0.0, cum[-1] + size, size), side='right')
+            starts = (cum - _seg_table()['length'][self._codes()]).astype(float)
+            self._buckets = (1.0 / size, np.minimum(first, len(cum) - 1).astype(np.int32), starts)
+        return self._buckets
+    
+    @property
+    def length(self) -> int:
+        cum = self._cumlen()
+        return int(cum[-1]) if len(cum) else 0
+    
+    def _name(self, i: int) -> str:
+        return self.seg_prefix + str(i + self.seg_offset).zfill(3)
+    
+    def _names(self, idx: np.ndarray) -> np.ndarray:
+        return np.char.add(self.seg_prefix, np.char.zfill((idx + self.seg_offset).astype(str), 3))
+    
+    # Index of the segment and offset [mm] inside it for each position [mm] along the track (Binary search over the cumulative lengths)
+    def _locate(self, position) -> tuple:
+        cum = self._cumlen()
+        if not len(cum):
+            raise ValueError('The track has no segments')
+        
+        # The positions of a closed track wrap around
+        pos = np.asarray(position, dtype=float)
+        total = cum[-1]
+        if self._closed:
+            pos = pos - (np.floor(pos / total) * total)
+        elif ((pos < 0) | (pos > total)).any():
+            raise ValueError(f'The position must be between 0 and the length of the track ({total} mm)')
+        
+        # Scalar positions use a binary search, arrays use the bucket index
+        scale, first, starts = self._bucket_index()
+        if pos.ndim == 0:
+            idx = np.searchsorted(cum, pos, side='right')
+        else:
+            idx = first[np.minimum((pos * scale).astype(np.intp), len(first) - 1)]
+            idx = idx + (cum[idx] <= pos)
+        idx = np.minimum(idx, len(cum) - 1)
+        return idx, pos - starts[idx]
+    
+    def locate(self, position):
+        idx, offset = self._locate(position)
+        if np.ndim(idx) == 0:
+            return self._name(int(idx)), float(offset)
+        return self._names(idx), offset
+    
+    # Checks that the curved (b) and straight (a) ends of consecutive segments match, that a closed track turns a whole number of turns
+    # and ends at its start, and that an open track does not end inside a curve. A track that turns a whole number of turns is expected to close
+    def validate(self, closed: Optional[bool] = None, tolerance: float = 0.01) -> Dict[str, any]:
+        codes = self._codes()
+        n = len(codes)
+        if not n:
+            return {'valid': False, 'closed': bool(closed), 'heading': 0.0, 'gap': 0.0, 'invalid': np.empty(0, dtype=np.intp), 'errors': ['The track has no segments']}
+        
+        # Heading steps before each segment, the end point is the sum of the chords of each segment type rotated by each heading
+        rs, re, chord = _seg_steps()
+        steps = np.cumsum((rs + re)[codes])
+        turns = int(steps[-1])
+        heading = np.concatenate(([0], steps[:-1])) % 16
+        vec = np.bincount((heading * 4) + codes, minlength=64).reshape(16, 4) @ chord
+        k = np.arange(16) * (np.pi / 8)
+        dx = float(((vec[:, 0] * np.cos(k)) - (vec[:, 1] * np.sin(k))).sum())
+        dy = float(((vec[:, 0] * np.sin(k)) + (vec[:, 1] * np.cos(k))).sum())
+        gap = float(np.hypot(dx, dy))
+        if closed is None:
+            closed = self._closed or (turns != 0 and turns % 16 == 0)
+        
+        # A curved end must be followed by a curved start (AB -> BA/BB) and a straight end by a straight start (AA/BA -> AA/AB)
+        start_b = rs[codes] > 0
+        end_b = re[codes] > 0
+        invalid = np.flatnonzero(end_b[:-1] != start_b[1:])
+        if closed and end_b[-1] != start_b[0]:
+            invalid = np.append(invalid, n - 1)
+        
+        errors = []
+        if len(invalid):
+            pairs = ', '.join(f'{self._name(int(i))} -> {self._name((int(i) + 1) % n)}' for i in invalid[:5])
+            errors.append(f'{len(invalid)} impossible segment sequences ({pairs}{", ..." if len(invalid) > 5 else ""})')
+        if closed and turns % 16:
+            errors.append(f'The loop does not close, the headings sum {turns * 22.5}° instead of a multiple of 360°')
+        elif closed and gap > tolerance:
+            errors.append(f'The loop does not close, the end is {gap:.3f} mm away from the start')
+        elif not closed:
+            if start_b[0]:
+                errors.append(f'Dangling end, the track starts inside a curve ({self._name(0)})')
+            if end_b[-1]:
+                errors.append(f'Dangling end, the track ends inside a curve ({self._name(n - 1)})')
+        
+        return {
+            'valid': not errors,
+            'closed': bool(closed),
+            'heading': turns * 22.5,
+            'gap': gap,
+            'invalid': invalid,
+            'errors': errors,
+        }
     
     def info(self, compact: bool = False) -> Dict[str, any]:
         return {
             'seg_prefix': self.seg_prefix,
             'seg_offset': self.seg_offset,
-            'length': sum(s._info['length'] for s in self.segment),
-            'segment': [s._info for s in self.segment] if not compact else f'The track has {len(self.segment)} segments',
+            'length': self.length,
+            'segment': [s._info for s in self.segment] if not compact else f'The track has {len(self)} segments',
         }
     
-    def plot(self, angle: float = 0, show_id: bool = False, seg_body_fill: str = None, seg_body_stroke: str = None, seg_border_stroke: str = None, seg_dir_fill: str = None, seg_dir_stroke: str = None, seg_id_fill: str = None, seg_id_stroke: str = None, seg_id_stroke_width: float = None) -> _TTrack:
+    def _codes(self) -> np.ndarray:
+        return self._buf
+    
+    def _render_key(self) -> tuple:
+        return ('Track', self._codes().tobytes(), self.seg_prefix, self.seg_offset)
+    
+    def _chain(self, codes: np.ndarray, heading: float, px: float, py: float):
+        geo = _seg_table()
+        n = len(codes)
+        gap = _config.gap
+        
+        # Accumulate the headings in the same order as the segments are chained: start, rs, re, rs, re, ...
+        steps = np.empty(2*n + 1)
+        steps[0] = heading
+        steps[1::2] = geo['rs'][codes]
+        steps[2::2] = geo['re'][codes]
+        headings = np.cumsum(steps)
+        rot = headings[1::2]
+        
+        tl = geo['tl'][codes]
+        tr = geo['tr'][codes]
+        c = np.cos(np.deg2rad(rot))
+        s = np.sin(np.deg2rad(rot))
+        
+        # Alternate the offset to the segment origin and the advance to the next segment, then accumulate them
+        dx = np.empty(2*n + 1)
+        dy = np.empty(2*n + 1)
+        dx[0] = px
+        dy[0] = py
+        dx[1::2] = tl[:, 1] * s
+        dy[1::2] = -(tl[:, 1] * c)
+        dx[2::2] = (tr[:, 0] * c) + (tr[:, 1] * np.cos(np.deg2rad(rot + 90))) + (gap * c)
+        dy[2::2] = (tr[:, 0] * s) + (tr[:, 1] * np.sin(np.deg2rad(rot + 90))) + (gap * s)
+        x = np.cumsum(dx)
+        y = np.cumsum(dy)
+        
+        # Return the poses and the state to chain the next segments (Heading and position after the last segment)
+        return (x[1::2], y[1::2], rot, headings[0:-1:2], headings[2::2]), (float(headings[-1]), float(x[-1]), float(y[-1]))
+    
+    def _pose_chunks(self, angle: float = 0, size: int = 4096):
+        codes = self._codes()
+        state = (angle, *_seg_table()['tl'][codes[0]]) if len(codes) else None
+        for i in range(0, len(codes), size):
+            chunk = codes[i:i + size]
+            poses, state = self._chain(chunk, *state)
+            yield (chunk, *poses)
+    
+    # The poses of the last angle (And gap) are cached until the segments of the track change
+    def _poses(self, angle: float = 0):
+        key = (angle, _config.gap)
+        if self._pose_cache is None or self._pose_cache[0] != key:
+            codes = self._codes()
+            tl = _seg_table()['tl'][codes[0]] if len(codes) else (0.0, 0.0)
+            poses, _ = self._chain(codes, angle, *tl)
+            self._pose_cache = (key, (codes, *poses))
+            self._trig_cache = None
+        return self._pose_cache[1]
+    
+    def _pose_trig(self, angle: float = 0) -> tuple:
+        rot = self._poses(angle)[3]
+        if self._trig_cache is None:
+            self._trig_cache = (np.cos(np.deg2rad(rot)), np.sin(np.deg2rad(rot)))
+        return self._trig_cache
+    
+    def _extents(self, codes: np.ndarray, x: np.ndarray, y: np.ndarray, rot: np.ndarray):
+        geo = _seg_table()
+        w = geo['w'][codes]
+        h = geo['h'][codes]
+        nw = [(w*np.cos(np.deg2rad(rot))).round(3), (h*np.cos(np.deg2rad(90+rot))).round(3)]
+        nh = [(w*np.sin(np.deg2rad(rot))).round(3), (h*np.sin(np.deg2rad(90+rot))).round(3)]
+        
+        xmax = max(0.0, x.max(initial=0.0), (x + np.maximum(nw[0], 0) + np.maximum(nw[1], 0)).max(initial=0.0))
+        ymax = max(0.0, y.max(initial=0.0), (y + np.maximum(nh[0], 0) + np.maximum(nh[1], 0)).max(initial=0.0))
+        xmin = min(0.0, x.min(initial=0.0), (x + np.minimum(nw[0], 0) + np.minimum(nw[1], 0)).min(initial=0.0))
+        ymin = min(0.0, y.min(initial=0.0), (y + np.minimum(nh[0], 0) + np.minimum(nh[1], 0)).min(initial=0.0))
+        return float(xmin), float(ymin), float(xmax), float(ymax)
+    
+    # Exact extents of the segment shapes [Drawing units], each segment is rotated by the angle plus a whole number of heading steps so the
+    # extents of its rotated shape come from a lookup table. The result of the last angle (And gap) is cached until the segments change
+    def bbox(self, angle: float = 0) -> tuple:
         # Limit angle between [0°, 360°)
         angle %= 360.0
         
-        xabs = self.segment[0]._svg['svg']['border']['points'][0][0]
-        yabs = self.segment[0]._svg['svg']['border']['points'][0][1]
+        key = (angle, _config.gap)
+        if self._bbox_cache is None or self._bbox_cache[0] != key:
+            codes, x, y, rot, _, _ = self._poses(angle)
+            if not len(codes):
+                raise ValueError('The track has no segments')
+            ext = _shape_extents(angle)[((np.rint((rot - angle) / 22.5).astype(np.intp) % 16) * 4) + codes]
+            self._bbox_cache = (key, (float((x + ext[:, 0]).min()), float((y + ext[:, 1]).min()), float((x + ext[:, 2]).max()), float((y + ext[:, 3]).max())))
+        return self._bbox_cache[1]
+    
+    def poses(self, angle: float = 0) -> Dict[str, np.ndarray]:
+        # Limit angle between [0°, 360°)
+        angle %= 360.0
         
-        rot = angle
-        gap = _config.gap
-        xmax = 0.0
-        ymax = 0.0
-        xmin = 0.0
-        ymin = 0.0
-        
-        # Create drawing and append the group
-        self._dwg = svgwrite.Drawing(profile='tiny')
-        
-        for i, seg in enumerate(self.segment):
-            rot += seg._svg['rs']
-            tl = seg._svg['svg']['border']['points'][0]
-            tr = seg._svg['svg']['border']['points'][-1]
-            
-            xabs += (tl[1] * np.sin(np.deg2rad(rot)))
-            yabs -= (tl[1] * np.cos(np.deg2rad(rot)))
-            
-            w = seg._svg['w']
-            h = seg._svg['h']
-            nw = [(w*np.cos(np.deg2rad(rot))).round(3), (h*np.cos(np.deg2rad(90+rot))).round(3)]
-            nh = [(w*np.sin(np.deg2rad(rot))).round(3), (h*np.sin(np.deg2rad(90+rot))).round(3)]
-            
-            xmax = max(xmax, xabs, xabs + sum(x for x in nw if x > 0))
-            ymax = max(ymax, yabs, yabs + sum(y for y in nh if y > 0))
-            xmin = min(xmin, xabs, xabs + sum(x for x in nw if x < 0))
-            ymin = min(ymin, yabs, yabs + sum(y for y in nh if y < 0))
+        codes, x, y, rot, heading_start, heading_end = self._poses(angle)
+        geo = _seg_table()
+        tl = geo['tl'][codes]
+        tr = geo['tr'][codes]
+        c = np.cos(np.deg2rad(rot))
+        s = np.sin(np.deg2rad(rot))
+        
+        return {
+            'x': x.copy(),
+            'y': y.copy(),
+            'rotation': rot.copy(),
+            'start_x': x + (tl[:, 0] * c) - (tl[:, 1] * s),
+            'start_y': y + (tl[:, 0] * s) + (tl[:, 1] * c),
+            'start_heading': heading_start.copy(),
+            'end_x': x + (tr[:, 0] * c) - (tr[:, 1] * s),
+            'end_y': y + (tr[:, 0] * s) + (tr[:, 1] * c),
+            'end_heading': heading_end.copy(),
+        }
+    
+    def to_xy(self, position, angle: float = 0, segment = None) -> Dict[str, any]:
+        # Limit angle between [0°, 360°)
+        angle %= 360.0
+        
+        # The position is measured along the track, or inside each segment (Index or name) when the segment is given
+        if segment is None:
+            idx, offset = self._locate(position)
+        else:
+            idx = np.asarray(segment)
+            if idx.dtype.kind in 'US':
+                names = idx.ravel().tolist()
+                digits = len(self.seg_prefix)
+                if not all(name.startswith(self.seg_prefix) and name[digits:].isdigit() for name in names):
+                    raise ValueError(f'The segment names must be the prefix "{self.seg_prefix}" followed by the segment number')
+                idx = np.asarray([int(name[digits:]) - self.seg_offset for name in names]).reshape(idx.shape)
+            if ((idx < 0) | (idx >= len(self))).any():
+                raise ValueError('The segment index is out of range')
+            offset = np.asarray(position, dtype=float)
+            length = _seg_table()['length'][self._codes()][idx]
+            if ((offset < 0) | (offset > length)).any():
+                raise ValueError('The position must be between 0 and the length of the segment')
+        
+        codes, x, y, rot, _, _ = self._poses(angle)
+        cos, sin = self._pose_trig(angle)
+        curve = _curve_table()
+        code = codes[idx]
+        
+        # Interpolate the curve of each segment type (Local coordinates) and apply the pose of the segment
+        f = np.clip(offset * curve['scale'][code], 0.0, _CURVE_SAMPLES)
+        i = np.minimum(f.astype(np.intp), _CURVE_SAMPLES - 1)
+        w = f - i
+        k = curve['base'][code] + i
+        lx, ly, lh = ((t[k] * (1 - w)) + (t[k + 1] * w) for t in (curve['x'], curve['y'], curve['heading']))
+        c = cos[idx]
+        s = sin[idx]
+        xy = {
+            'x': x[idx] + (lx * c) - (ly * s),
+            'y': y[idx] + (lx * s) + (ly * c),
+            'heading': rot[idx] + lh,
+        }
+        if np.ndim(idx) == 0:
+            return {k: float(v) for k, v in xy.items()}
+        return xy
+    
+    def _bounds(self, chunks):
+        xmin, ymin, xmax, ymax = 0.0, 0.0, 0.0, 0.0
+        used = set()
+        for codes, x, y, rot, _, _ in chunks:
+            used.update(np.unique(codes).tolist())
+            bounds = self._extents(codes, x, y, rot)
+            xmin, ymin = min(xmin, bounds[0]), min(ymin, bounds[1])
+            xmax, ymax = max(xmax, bounds[2]), max(ymax, bounds[3])
+        return (xmin, ymin, xmax, ymax), used
+    
+    def _write_groups(self, write, backend, chunks, ox: float, oy: float, show_id: bool, styles: tuple, symbols: bool) -> None:
+        segments = iter(self.segment)
+        for codes, x, y, rot, _, _ in chunks:
+            for xabs, yabs, r in zip((x + ox).tolist(), (y + oy).tolist(), rot.tolist()):
+                seg = next(segments)
+                
+                # Write the group translated and rotated
+                write(backend.group(seg, r, show_id, *styles, f'#symSeg_{seg._s}' if symbols else None, _q(xabs, 3), _q(yabs, 3), _q(r, 3)))
+    
+    def animate(self, positions, target = None, frame_time: float = 0.1, mode: str = 'smil', angle: float = 0, shuttle_fill: str = '#1e90ff', shuttle: Optional[_Shuttle] = None, **kwargs):
+        shuttle = _const('PARAM').shuttle if shuttle is None else shuttle
+        
+        # Positions [mm] of each shuttle (Columns) in each frame (Rows)
+        positions = np.asarray(positions, dtype=float)
+        positions = positions.reshape(-1, 1) if positions.ndim == 1 else positions
+        if positions.ndim != 2 or not positions.size:
+            raise ValueError('The positions must be an array of frames (Rows) and shuttles (Columns)')
+        if mode not in ('smil', 'frames'):
+            raise ValueError('The animation mode is not valid, please configure one of the following values: [\'smil\', \'frames\']')
+        if frame_time <= 0:
+            raise ValueError('The frame time must be greater than 0')
+        
+        # The track is drawn once (Without the closing tag) and the coordinates of the shuttles in all the frames are calculated in one call
+        background = self.to_svg(angle, **kwargs)[:-len('</svg>')]
+        xy = self.to_xy(positions, angle)
+        x = np.round(xy['x'], 3)
+        y = np.round(xy['y'], 3)
+        heading = np.round(np.rad2deg(np.unwrap(np.deg2rad(xy['heading']), axis=0)), 2)
+        
+        # The shuttle shape is defined once [m -> drawing units], from the back to the front of the shuttle
+        defs = _xml('defs', {}, _xml('rect', {
+            'id': 'shuttle',
+            'x': round(-shuttle.extent_back * 100, 3),
+            'y': round(-shuttle.width * 50, 3),
+            'width': round((shuttle.extent_front + shuttle.extent_back) * 100, 3),
+            'height': round(shuttle.width * 100, 3),
+            'fill': shuttle_fill,
+            'stroke': '#000000',
+            'stroke_width': 0.1,
+        }))
+        
+        if mode == 'frames':
+            # Each frame only adds the shuttles to the drawing of the track
+            target = 'frame_{:04d}.svg' if target is None else target
+            paths = []
+            for f in range(len(positions)):
+                overlay = ''.join(f'<use transform="translate({a},{b}) rotate({r})" xlink:href="#shuttle" />' for a, b, r in zip(x[f].tolist(), y[f].tolist(), heading[f].tolist()))
+                path = target.format(f)
+                _write_svg(lambda write: (write(background), write(defs), write(overlay), write('</svg>')), path)
+                paths.append(path)
+            return paths
+        
+        # One SVG image, the translation and rotation of each shuttle are animated over all the frames (SMIL)
+        dur = f'{_num(len(positions) * frame_time)}s'
+        overlay = []
+        for i in range(positions.shape[1]):
+            moves = _xml('animateTransform', {'attributeName': 'transform', 'type': 'translate', 'values': ';'.join(f'{a},{b}' for a, b in zip(x[:, i].tolist(), y[:, i].tolist())), 'dur': dur, 'repeatCount': 'indefinite'})
+            turns = _xml('animateTransform', {'attributeName': 'transform', 'type': 'rotate', 'values': ';'.join(map(str, heading[:, i].tolist())), 'dur': dur, 'repeatCount': 'indefinite', 'additive': 'sum'})
+            overlay.append(_xml('use', {'xlink:href': '#shuttle'}, moves + turns))
+        svg = background + defs + ''.join(overlay) + '</svg>'
+        if target is None:
+            return svg
+        _write_svg(lambda write: write(svg), target)
+    
+    def simulate(self, duration: float, dt: float = 0.01, record: float = 0.1, count: Optional[int] = None, shuttle: Optional[_Shuttle] = None) -> Dict[str, any]:
+        shuttle = _const('PARAM').shuttle if shuttle is None else shuttle
+        count = shuttle.count if count is None else count
+        par = shuttle.stereotype_par
+        
+        # Limits in mm and s, the jerk filter time limits the change of the acceleration
+        vmax = par.velocity * 1000
+        acc = par.acceleration * 1000
+        dec = par.deceleration * 1000
+        jerk = (max(acc, dec) / par.jerk) if par.jerk > 0 else np.inf
+        pitch = (shuttle.extent_front + shuttle.extent_back + shuttle.collision_distance) * 1000
+        total = float(self.length)
+        
+        if not (duration > 0 and dt > 0 and record >= dt):
+            raise ValueError('The duration and time step must be positive and the record interval at least one time step')
+        if count < 1:
+            raise ValueError('At least one shuttle is required')
+        if (count * pitch) > total:
+            raise ValueError(f'{count} shuttles do not fit on the track ({total} mm), each shuttle needs {pitch} mm')
+        
+        # The shuttles keep their order (Shuttle i+1 is in front of shuttle i), on a loop they start evenly spaced and the last one
+        # follows the first one a lap ahead, on an open track they start packed at the beginning and the last one stops at the end
+        closed = self._closed
+        start = (np.arange(count) * (total / count)) if closed else (np.arange(count) * pitch)
+        pos = start.copy()
+        vel = np.zeros(count)
+        a = np.zeros(count)
+        gap = np.empty(count)
+        v_safe = np.empty(count)
+        a_cmd = np.empty(count)
+        
+        steps = int(round(duration / dt))
+        every = max(1, int(round(record / dt)))
+        n = (steps // every) + 1
+        rec_time = np.arange(n) * (every * dt)
+        rec_pos = np.empty((n, count), dtype=np.float32)
+        rec_vel = np.empty((n, count), dtype=np.float32)
+        rec_pos[0] = pos
+        rec_vel[0] = 0.0
+        clamps = 0
+        
+        for step in range(1, steps + 1):
+            # Free distance to the shuttle in front (Or to the end of an open track)
+            np.subtract(pos[1:], pos[:-1], out=gap[:-1])
+            gap[-1] = (pos[0] + total - pos[-1]) if closed else (total - pos[-1] + pitch)
+            gap -= pitch
             
-            # Create group
-            g = seg._group(seg._svg, rot, show_id, seg_body_fill, seg_body_stroke, seg_border_stroke, seg_dir_fill, seg_dir_stroke, seg_id_fill, seg_id_stroke, seg_id_stroke_width)
+            # Enforce the collision distance, a shuttle too close to the one in front is moved back and takes its velocity
+            if gap.min() < -1e-3:
+                over = gap < -1e-3
+                clamps += int(over.sum())
+                pos[over] += gap[over]
+                vel[over] = np.minimum(vel[over], np.roll(vel, -1)[over])
+                gap[over] = 0.0
             
-            # Apply translation and rotation to the group
-            g.translate(round(xabs, 3), round(yabs, 3))
-            g.rotate(round(rot, 3))
+            # Maximum velocity to stop before the shuttle in front, the acceleration is limited by the jerk
+            np.maximum(gap, 0.0, out=v_safe)
+            v_safe *= 2 * dec
+            np.sqrt(v_safe, out=v_safe)
+            np.minimum(v_safe, vmax, out=v_safe)
+            np.subtract(v_safe, vel, out=a_cmd)
+            a_cmd /= dt
+            np.clip(a_cmd, -dec, acc, out=a_cmd)
+            a_cmd -= a
+            np.clip(a_cmd, -jerk * dt, jerk * dt, out=a_cmd)
+            a += a_cmd
             
-            self._dwg.add(g)
+            # Integrate, the velocity never exceeds the safe velocity (Braking without the jerk limit if needed)
+            v_new = vel + (a * dt)
+            np.clip(v_new, 0.0, v_safe, out=v_new)
+            np.subtract(v_new, vel, out=a)
+            a /= dt
+            vel = v_new
+            pos += vel * dt
             
-            xabs += ((tr[0] * np.cos(np.deg2rad(rot))) + (tr[1] * np.cos(np.deg2rad(rot + 90))) + (gap * np.cos(np.deg2rad(rot))))
-            yabs += ((tr[0] * np.sin(np.deg2rad(rot))) + (tr[1] * np.sin(np.deg2rad(rot + 90))) + (gap * np.sin(np.deg2rad(rot))))
-            rot +=  seg._svg['re']
+            if (step % every) == 0:
+                i = step // every
+                # On a loop the positions are wrapped before they are recorded (float32 loses precision on long distances)
+                rec_pos[i] = np.mod(pos, total) if closed else pos
+                rec_vel[i] = vel
         
-        nw = (abs(xmax) + abs(xmin))
-        nh = (abs(ymax) + abs(ymin))
-        nx = abs(xmin)
-        ny = abs(ymin)
+        # Positions in mm along the track (Wrapped on a loop) and velocities in m/s
+        rec_vel /= 1000
+        return {
+            'time': rec_time,
+            'position': rec_pos,
+            'velocity': rec_vel,
+            'distance': pos - start,
+            'clamps': clamps,
+        }
+    
+    def _write(self, write, angle: float = 0, show_id: bool = False, seg_body_fill: str = None, seg_body_stroke: str = None, seg_border_stroke: str = None, seg_dir_fill: str = None, seg_dir_stroke: str = None, seg_id_fill: str = None, seg_id_stroke: str = None, seg_id_stroke_width: float = None) -> None:
+        # Limit angle between [0°, 360°)
+        angle %= 360.0
         
-        self._dwg.viewbox(-nx, -ny, nw, nh)
-        self._dwg['width'] = nw*mm
-        self._dwg['height'] = nh*mm
-
-        display(self._dwg)
+        # First pass, only the poses are calculated to get the extents of the drawing (And the segment types used)
+        bounds, used = self._bounds(self._pose_chunks(angle))
+        
+        # Second pass, each group is written as soon as its pose is calculated
+        backend = _backend()
+        _write_header(write, backend, bounds, used, (seg_body_fill, seg_body_stroke, seg_border_stroke, seg_dir_fill, seg_dir_stroke))
+        self._write_groups(write, backend, self._pose_chunks(angle), 0.0, 0.0, show_id, (seg_body_fill, seg_body_stroke, seg_border_stroke, seg_dir_fill, seg_dir_stroke, seg_id_fill, seg_id_stroke, seg_id_stroke_width), _config.svg_symbols)
+        write('</svg>')
+    
+    def _render(self, *args) -> str:
+        key = (self._render_key(), _render_options(), args[0] % 360.0) + args[1:]
+        return _render_cache.get(key, lambda: self._to_string(*args))
+    
+    def _to_string(self, *args) -> str:
+        buffer = io.StringIO()
+        self._write(buffer.write, *args)
+        return buffer.getvalue()
+    
+    def to_svg(self, angle: float = 0, show_id: bool = False, seg_body_fill: str = None, seg_body_stroke: str = None, seg_border_stroke: str = None, seg_dir_fill: str = None, seg_dir_stroke: str = None, seg_id_fill: str = None, seg_id_stroke: str = None, seg_id_stroke_width: float = None) -> str:
+        return self._render(angle, show_id, seg_body_fill, seg_body_stroke, seg_border_stroke, seg_dir_fill, seg_dir_stroke, seg_id_fill, seg_id_stroke, seg_id_stroke_width)
+    
+    def render_to(self, target, angle: float = 0, show_id: bool = False, seg_body_fill: str = None, seg_body_stroke: str = None, seg_border_stroke: str = None, seg_dir_fill: str = None, seg_dir_stroke: str = None, seg_id_fill: str = None, seg_id_stroke: str = None, seg_id_stroke_width: float = None) -> None:
+        # Without render cache the image is written while it is generated (Streaming)
+        if _config.render_cache:
+            _write_svg(lambda write: write(self._render(angle, show_id, seg_body_fill, seg_body_stroke, seg_border_stroke, seg_dir_fill, seg_dir_stroke, seg_id_fill, seg_id_stroke, seg_id_stroke_width)), target)
+        else:
+            _write_svg(lambda write: self._write(write, angle, show_id, seg_body_fill, seg_body_stroke, seg_border_stroke, seg_dir_fill, seg_dir_stroke, seg_id_fill, seg_id_stroke, seg_id_stroke_width), target)
+    
+    def plot(self, angle: float = 0, show_id: bool = False, seg_body_fill: str = None, seg_body_stroke: str = None, seg_border_stroke: str = None, seg_dir_fill: str = None, seg_dir_stroke: str = None, seg_id_fill: str = None, seg_id_stroke: str = None, seg_id_stroke_width: float = None) -> _TTrack:
+        svg = self._render(angle, show_id, seg_body_fill, seg_body_stroke, seg_border_stroke, seg_dir_fill, seg_dir_stroke, seg_id_fill, seg_id_stroke, seg_id_stroke_width)
+        
+        # Keep the plot arguments (Not the drawing) so the image can be saved later
+        self._plot_args = (angle, show_id, seg_body_fill, seg_body_stroke, seg_border_stroke, seg_dir_fill, seg_dir_stroke, seg_id_fill, seg_id_stroke, seg_id_stroke_width)
+        
+        # Display the drawing
+        _display(svg)
         
         return self
     
     def save(self, name: str = 'Track.svg') -> None:
-        self._dwg.saveas(name)
+        self.render_to(name, *getattr(self, '_plot_args', ()))
     
     __rmul__ = __mul__
     
+# Segment type codes of each loop size with the cumulative lengths and the poses (Not rotated) calculated once, the arrays are read-only
+# because they are shared by all the loops of the same size
+@lru_cache(maxsize=1024)
+def _loop_template(l: int, w: int) -> Track:
+    t0 = np.array([_SEG_CODE['aa']], dtype=np.uint8)
+    t90 = np.array([_SEG_CODE[s] for s in ('ab', 'bb', 'ba')], dtype=np.uint8)
+    t180 = np.array([_SEG_CODE[s] for s in ('ab', 'bb', 'bb', 'bb', 'ba')], dtype=np.uint8)
+    if (w == 1):
+        codes = np.concatenate((t180, np.tile(t0, l - 2), t180, np.tile(t0, l - 2)))
+    else:
+        codes = np.concatenate((t90, np.tile(t0, w - 2), t90, np.tile(t0, l - 2), t90, np.tile(t0, w - 2), t90, np.tile(t0, l - 2)))
+    
+    template = Track._from_codes(codes)
+    template._bucket_index()
+    template._pose_trig(0)
+    for a in (codes, template._cum, *template._buckets[1:], *template._pose_cache[1][1:], *template._trig_cache):
+        a.flags.writeable = False
+    return template
+
 # Loop class
-@typechecked
+@_typechecked
 class Loop(Track):
+    _closed = True
+    
     def __init__(self, l: int = 2, w: int = 1, seg_prefix: str = 'gSeg_', seg_offset: int = 1) -> None:
         self._l = l
         self._w = w
 
-        if (self._l < 2):
+        if not isinstance(l, int) or not isinstance(w, int):
+            raise TypeError('The length and width of the loop must be integers')
+        elif (self._l < 2):
             raise ValueError('The length of the loop must be at least 2')
         elif (self._w < 1):
             raise ValueError('The width of the loop must be at least 1')
-        else:
-            if (self._w == 1):
-                self._track = TRACK180 + ((self._l - 2) * TRACK0) + TRACK180 + ((self._l - 2) * TRACK0)
-            else:
-                self._track = TRACK90 + ((self._w - 2) * TRACK0) + TRACK90 + ((self._l - 2) * TRACK0) + TRACK90 + ((self._w - 2) * TRACK0) + TRACK90 + ((self._l - 2) * TRACK0)
-        super().__init__(self._track.segment, seg_prefix, seg_offset)
+        
+        # The codes, lengths and poses are shared with the other loops of the same size, only the names depend on the instance
+        template = _loop_template(l, w)
+        self._set_codes(template._codes(), seg_prefix, seg_offset)
+        self._cum = template._cum
+        self._buckets = template._buckets
+        self._pose_cache = template._pose_cache
+        self._trig_cache = template._trig_cache
 
     def __add__(self, other: _TST) -> _TAssembly:
         if isinstance(other, Segment):
@@ -554,15 +1617,20 @@ class Loop(Track):
         l = [self]
         return Assembly([ item for item in l for _ in range(other) ])
 
+    def __iadd__(self, other: _TST) -> _TAssembly:
+        return self + other
+
     __rmul__ = __mul__
 
     def save(self, name: str = 'Loop.svg') -> None:
-        self._dwg.saveas(name)
+        self.render_to(name, *getattr(self, '_plot_args', ()))
 
 # Assembly class
-@typechecked
+@_typechecked
 class Assembly(object):
     def __init__(self, tracks: List[Track], name: str = 'gAssembly_1') -> None:
+        if not all(isinstance(track, Track) for track in tracks):
+            raise TypeError('Assemblies can only be created from Track objects')
         self.name = name
         self.track = list()
         
@@ -570,18 +1638,386 @@ class Assembly(object):
         for track in tracks:
             if old_prefix != track.seg_prefix:
                 t_len = track.seg_offset
-            self.track.append(Track(track.segment, track.seg_prefix, t_len))
+            self.track.append(Track._from_codes(track._codes(), track.seg_prefix, t_len))
             t_len += len(track)
             old_prefix = track.seg_prefix
     
+    @property
+    def length(self) -> int:
+        return sum(t.length for t in self.track)
+    
+    # Index of the track, index of the segment and offset [mm] inside it for each position [mm] along all the tracks of the assembly
+    def _locate(self, position) -> tuple:
+        lengths = np.array([t.length for t in self.track], dtype=float)
+        ends = np.cumsum(lengths)
+        pos = np.asarray(position, dtype=float)
+        if not len(ends) or ((pos < 0) | (pos > ends[-1])).any():
+            raise ValueError(f'The position must be between 0 and the length of the assembly ({self.length} mm)')
+        
+        ti = np.minimum(np.searchsorted(ends, pos, side='right'), len(ends) - 1)
+        local = pos - (ends[ti] - lengths[ti])
+        idx = np.zeros(pos.shape, dtype=np.intp)
+        offset = np.zeros(pos.shape)
+        for i in np.unique(ti).tolist():
+            mask = ti == i
+            idx[mask], offset[mask] = self.track[i]._locate(local[mask])
+        return ti, idx, offset
+    
+    def locate(self, position):
+        ti, idx, offset = self._locate(position)
+        if np.ndim(ti) == 0:
+            return self.track[int(ti)]._name(int(idx)), float(offset)
+        names = np.empty(ti.shape, dtype=object)
+        for i in np.unique(ti).tolist():
+            mask = ti == i
+            names[mask] = self.track[i]._names(idx[mask])
+        return names.astype(str), offset
+    
+    def simulate(self, stations: Sequence[Sequence[float]], duration: float, count: Optional[int] = None, shuttle: Optional[_Shuttle] = None) -> Dict[str, any]:
+        shuttle = _const('PARAM').shuttle if shuttle is None else shuttle
+        count = shuttle.count if count is None else count
+        pitch = (shuttle.extent_front + shuttle.extent_back + shuttle.collision_distance) * 1000
+        total = float(self.length)
+        
+        # Each station is a position along the assembly [mm] and a process time [s], the shuttles go around all the stations in order
+        n = len(stations)
+        if n < 1:
+            raise ValueError('At least one station is required')
+        if any(len(station) != 2 for station in stations):
+            raise ValueError('Each station must be a (position, process time) tuple')
+        pos = [float(station[0]) for station in stations]
+        dwell = [float(station[1]) for station in stations]
+        if any(p < 0 or p >= total for p in pos) or any(pos[i] >= pos[i + 1] for i in range(n - 1)):
+            raise ValueError(f'The station positions must be increasing and between 0 and the length of the assembly ({total} mm)')
+        if any(t < 0 for t in dwell) or duration <= 0:
+            raise ValueError('The process times must be positive and the duration greater than 0')
+        
+        # Distance to the next station and buffer of each station (Shuttles that fit before it keeping the collision distance)
+        dist = [((pos[(i + 1) % n] - pos[i]) % total) or total for i in range(n)]
+        capacity = [max(1, int(dist[i - 1] // pitch)) for i in range(n)]
+        travel = [_move_time(d, shuttle) for d in dist]
+        advance = _move_time(pitch, shuttle)
+        if count < 1 or count > (sum(capacity) + n):
+            raise ValueError(f'The number of shuttles must be between 1 and {sum(capacity) + n} for these stations')
+        
+        queue = [deque() for _ in range(n)]
+        incoming = [0] * n
+        busy = [False] * n
+        blocked = [False] * n
+        since = [0.0] * n
+        busy_time = [0.0] * n
+        blocked_time = [0.0] * n
+        processed = [0] * n
+        area = [0.0] * n
+        last = [0.0] * n
+        queue_max = [0] * n
+        wait_time = [0.0] * n
+        arrival = [deque() for _ in range(n)]
+        events = []
+        seq = 0
+        done = 0
+        now = 0.0
+        
+        def queue_change(i, d):
+            area[i] += len(queue[i]) * (now - last[i])
+            last[i] = now
+            if d > 0:
+                queue[i].append(d)
+                arrival[i].append(now)
+                queue_max[i] = max(queue_max[i], len(queue[i]))
+        
+        def start(i):
+            nonlocal seq
+            waited = now - arrival[i].popleft()
+            area[i] += len(queue[i]) * (now - last[i])
+            last[i] = now
+            queue[i].popleft()
+            wait_time[i] += waited
+            busy[i] = True
+            since[i] = now
+            heapq.heappush(events, (now + dwell[i] + (advance if waited > 0 else 0.0), seq, 1, i))
+            seq += 1
+        
+        def release(i):
+            nonlocal seq
+            # The processed shuttle leaves the station when there is space in the buffer of the next station
+            j = (i + 1) % n
+            while blocked[i] and (len(queue[j]) + incoming[j]) < capacity[j]:
+                blocked[i] = False
+                busy[i] = False
+                blocked_time[i] += now - since[i]
+                incoming[j] += 1
+                heapq.heappush(events, (now + travel[i], seq, 0, j))
+                seq += 1
+                
+                # The next shuttle of the buffer moves to the station, which makes space for the previous station
+                if queue[i]:
+                    start(i)
+                k = (i - 1) % n
+                if blocked[k]:
+                    i = k
+                    j = (i + 1) % n
+        
+        # The shuttles start in the buffers of the stations, each station holds one more shuttle that starts its process
+        for s in range(count):
+            i = s % n
+            while len(queue[i]) > capacity[i]:
+                i = (i + 1) % n
+            queue_change(i, 1)
+        for i in range(n):
+            if queue[i]:
+                start(i)
+            queue_max[i] = len(queue[i])
+        
+        while events and events[0][0] <= duration:
+            now, _, kind, i = heapq.heappop(events)
+            done += 1
+            if kind == 0:
+                # Arrival to the buffer of the station
+                incoming[i] -= 1
+                queue_change(i, 1)
+                if not busy[i]:
+                    start(i)
+                    release((i - 1) % n)
+            else:
+                # End of the process, the shuttle is blocked until it can leave
+                busy_time[i] += now - since[i]
+                processed[i] += 1
+                blocked[i] = True
+                since[i] = now
+                release(i)
+        
+        # Close the statistics at the end of the simulation
+        now = duration
+        for i in range(n):
+            area[i] += len(queue[i]) * (now - last[i])
+            if blocked[i]:
+                blocked_time[i] += now - since[i]
+            elif busy[i]:
+                busy_time[i] += now - since[i]
+        
+        return {
+            'duration': duration,
+            'events': done,
+            'deadlock': not events,
+            'throughput': processed[-1] * 3600 / duration,
+            'station': [{
+                'position': pos[i],
+                'processed': processed[i],
+                'utilization': busy_time[i] / duration,
+                'blocked': blocked_time[i] / duration,
+                'capacity': capacity[i],
+                'queue_mean': area[i] / duration,
+                'queue_max': queue_max[i],
+                'wait_mean': (wait_time[i] / (processed[i] + busy[i] + blocked[i])) if (processed[i] + busy[i] + blocked[i]) else 0.0,
+            } for i in range(n)],
+        }
+    
     def info(self, compact: bool = False) -> Dict[str, any]:
+        if compact:
+            return {
+                'name': self.name,
+                'length': self.length,
+                'track': f'The assembly has {len(self.track)} tracks',
+            }
+        
+        # Each track info is created once, the length of the assembly is the sum of the track lengths
+        tracks = [t.info() for t in self.track]
         return {
             'name': self.name,
-            'length': sum(t.info()['length'] for t in self.track),
-            'track': [t.info() for t in self.track] if not compact else f'The assembly has {len(self.track)} tracks',
+            'length': sum(t['length'] for t in tracks),
+            'track': tracks,
+        }
+    
+    def bbox(self, angle: float = 0, placement: Optional[Sequence[Sequence[float]]] = None) -> tuple:
+        # Limit angle between [0°, 360°)
+        angle %= 360.0
+        
+        # Extents of each track moved to its place in the layout
+        angles = [angle] * len(self.track) if placement is None else [p[2] % 360.0 for p in placement]
+        boxes = [(t.bbox(a), ox, oy) for (t, _, ox, oy, _), a in zip(self._layout(angle, placement), angles)]
+        if not boxes:
+            raise ValueError('The assembly has no tracks')
+        return (
+            min(b[0] + ox for b, ox, _ in boxes),
+            min(b[1] + oy for b, _, oy in boxes),
+            max(b[2] + ox for b, ox, _ in boxes),
+            max(b[3] + oy for b, _, oy in boxes),
+        )
+    
+    # Pairs of segments that intersect or are closer than the track separation [m] (Segments connected in the same track are not checked),
+    # the hulls of the segments are indexed in a uniform grid and only the segments that share a cell are compared
+    def overlaps(self, angle: float = 0, placement: Optional[Sequence[Sequence[float]]] = None, separation: Optional[float] = None) -> List[tuple]:
+        separation = _const('PARAM').track.separation if separation is None else separation
+        if separation < 0:
+            raise ValueError('The track separation must be positive')
+        angle %= 360.0
+        gap = separation * 100
+        hulls = _seg_hulls()
+        rs, re, _ = _seg_steps()
+        
+        # Hull of every segment moved to its place in the layout, a track that turns a whole number of turns is connected at both ends
+        px, py, track, index, sizes, closes = [], [], [], [], [], []
+        for i, (t, poses, ox, oy, _) in enumerate(self._layout(angle, placement)):
+            codes, x, y, rot, _, _ = poses
+            c = np.cos(np.deg2rad(rot))[:, None]
+            s = np.sin(np.deg2rad(rot))[:, None]
+            h = hulls[codes]
+            px.append((x + ox)[:, None] + (h[:, :, 0] * c) - (h[:, :, 1] * s))
+            py.append((y + oy)[:, None] + (h[:, :, 0] * s) + (h[:, :, 1] * c))
+            track.append(np.full(len(codes), i))
+            index.append(np.arange(len(codes)))
+            turns = int((rs + re)[codes].sum())
+            sizes.append(len(codes))
+            closes.append(turns != 0 and turns % 16 == 0)
+        if not sum(sizes):
+            return []
+        px, py, track, index = np.concatenate(px), np.concatenate(py), np.concatenate(track), np.concatenate(index)
+        sizes, closes = np.array(sizes), np.array(closes)
+        
+        # Boxes grown by the separation, the cells are as big as the biggest box so each box is in 1, 2 or 4 cells
+        x0, y0 = px.min(axis=1) - gap, py.min(axis=1) - gap
+        x1, y1 = px.max(axis=1) + gap, py.max(axis=1) + gap
+        cell = max(float((x1 - x0).max()), float((y1 - y0).max()))
+        cx0, cy0 = np.floor(x0 / cell).astype(np.int64), np.floor(y0 / cell).astype(np.int64)
+        cx1, cy1 = np.floor(x1 / cell).astype(np.int64), np.floor(y1 / cell).astype(np.int64)
+        kx = np.stack((cx0, cx1, cx0, cx1), axis=1)
+        ky = np.stack((cy0, cy0, cy1, cy1), axis=1)
+        used = np.stack((np.ones(len(px), dtype=bool), cx1 != cx0, cy1 != cy0, (cx1 != cx0) & (cy1 != cy0)), axis=1)
+        seg = np.broadcast_to(np.arange(len(px))[:, None], used.shape)[used]
+        kx, ky = kx[used] - cx0.min(), ky[used] - cy0.min()
+        key = (kx * (int(ky.max()) + 1)) + ky
+        order = np.lexsort((seg, key))
+        key, seg = key[order], seg[order]
+        
+        # Candidate pairs: the segments of the same cell (Sorted by cell, each offset d pairs the entries d places apart in the same cell)
+        first, second = [], []
+        for d in range(1, len(key)):
+            same = key[d:] == key[:-d]
+            if not same.any():
+                break
+            first.append(seg[:-d][same])
+            second.append(seg[d:][same])
+        if not first:
+            return []
+        pairs = np.unique((np.concatenate(first) * len(px)) + np.concatenate(second))
+        a, b = pairs // len(px), pairs % len(px)
+        near = (x0[a] <= x1[b]) & (x0[b] <= x1[a]) & (y0[a] <= y1[b]) & (y0[b] <= y1[a])
+        connected = (track[a] == track[b]) & ((np.abs(index[a] - index[b]) == 1) | (closes[track[a]] & (np.abs(index[a] - index[b]) == (sizes[track[a]] - 1))))
+        a, b = a[near & ~connected], b[near & ~connected]
+        
+        # Separating axis test with the normals of the edges of both hulls, the distance of the hulls that do not intersect is the minimum
+        # distance from the vertices of one hull to the edges of the other
+        A = np.stack((px[a], py[a]), axis=2)
+        B = np.stack((px[b], py[b]), axis=2)
+        edges = np.concatenate((np.roll(A, -1, axis=1) - A, np.roll(B, -1, axis=1) - B), axis=1)
+        axes = np.stack((-edges[:, :, 1], edges[:, :, 0]), axis=2)
+        pa = np.einsum('mkd,mjd->mkj', axes, A)
+        pb = np.einsum('mkd,mjd->mkj', axes, B)
+        separated = ((pa.max(axis=2) < pb.min(axis=2)) | (pb.max(axis=2) < pa.min(axis=2))).any(axis=1)
+        dist = np.where(separated, np.minimum(_point_edge_distance(A, B), _point_edge_distance(B, A)), 0.0)
+        close = (dist < gap) | ~separated
+        
+        return [(self.track[ta]._name(ia), self.track[tb]._name(ib), round(dd * 10, 3)) for ta, ia, tb, ib, dd in zip(track[a][close].tolist(), index[a][close].tolist(), track[b][close].tolist(), index[b][close].tolist(), dist[close].tolist())]
+    
+    def validate(self, tolerance: float = 0.01) -> Dict[str, any]:
+        tracks = [t.validate(tolerance=tolerance) for t in self.track]
+        errors = [f'Track {i + 1}: {e}' for i, t in enumerate(tracks) for e in t['errors']]
+        return {
+            'valid': not errors,
+            'errors': errors,
+            'track': tracks,
         }
     
+    def _render_key(self) -> tuple:
+        return ('Assembly', tuple(t._render_key() for t in self.track))
+    
+    def _layout(self, angle: float = 0, placement: Optional[Sequence[Sequence[float]]] = None) -> list:
+        # Each track is placed with its origin and angle (x, y, angle), by default the tracks are stacked from top to bottom
+        if placement is None:
+            layout = []
+            top = 0.0
+            for t in self.track:
+                poses = t._poses(angle)
+                (xmin, ymin, xmax, ymax), used = t._bounds([poses])
+                layout.append((t, poses, -xmin, top - ymin, used))
+                top += (ymax - ymin) + _ASM_SPACING
+            return layout
+        
+        if len(placement) != len(self.track):
+            raise ValueError(f'The placement must have one (x, y, angle) item for each track of the assembly ({len(self.track)})')
+        layout = []
+        for t, place in zip(self.track, placement):
+            if len(place) != 3:
+                raise ValueError('Each placement item must be a (x, y, angle) tuple')
+            x, y, a = place
+            poses = t._poses(a % 360.0)
+            _, used = t._bounds([poses])
+            layout.append((t, poses, float(x), float(y), used))
+        return layout
+    
+    def _write(self, write, angle: float = 0, show_id: bool = False, seg_body_fill: str = None, seg_body_stroke: str = None, seg_border_stroke: str = None, seg_dir_fill: str = None, seg_dir_stroke: str = None, seg_id_fill: str = None, seg_id_stroke: str = None, seg_id_stroke_width: float = None, placement: Optional[Sequence[Sequence[float]]] = None) -> None:
+        # Limit angle between [0°, 360°)
+        angle %= 360.0
+        
+        # The poses of each track are calculated once for the extents and the groups
+        layout = self._layout(angle, placement)
+        xmin, ymin, xmax, ymax = 0.0, 0.0, 0.0, 0.0
+        used = set()
+        for t, poses, ox, oy, u in layout:
+            codes, x, y, rot, _, _ = poses
+            bounds = t._extents(codes, x + ox, y + oy, rot)
+            xmin, ymin = min(xmin, bounds[0]), min(ymin, bounds[1])
+            xmax, ymax = max(xmax, bounds[2]), max(ymax, bounds[3])
+            used.update(u)
+        
+        # All tracks share the same drawing
+        backend = _backend()
+        _write_header(write, backend, (xmin, ymin, xmax, ymax), used, (seg_body_fill, seg_body_stroke, seg_border_stroke, seg_dir_fill, seg_dir_stroke))
+        for t, poses, ox, oy, _ in layout:
+            t._write_groups(write, backend, [poses], ox, oy, show_id, (seg_body_fill, seg_body_stroke, seg_border_stroke, seg_dir_fill, seg_dir_stroke, seg_id_fill, seg_id_stroke, seg_id_stroke_width), _config.svg_symbols)
+        write('</svg>')
+    
+    def _render(self, *args) -> str:
+        placement = args[-1] if args[-1] is None else tuple(tuple(float(v) for v in place) for place in args[-1])
+        key = (self._render_key(), _render_options(), args[0] % 360.0) + args[1:-1] + (placement,)
+        return _render_cache.get(key, lambda: self._to_string(*args))
+    
+    def _to_string(self, *args) -> str:
+        buffer = io.StringIO()
+        self._write(buffer.write, *args)
+        return buffer.getvalue()
+    
+    def to_svg(self, angle: float = 0, show_id: bool = False, seg_body_fill: str = None, seg_body_stroke: str = None, seg_border_stroke: str = None, seg_dir_fill: str = None, seg_dir_stroke: str = None, seg_id_fill: str = None, seg_id_stroke: str = None, seg_id_stroke_width: float = None, placement: Optional[Sequence[Sequence[float]]] = None) -> str:
+        return self._render(angle, show_id, seg_body_fill, seg_body_stroke, seg_border_stroke, seg_dir_fill, seg_dir_stroke, seg_id_fill, seg_id_stroke, seg_id_stroke_width, placement)
+    
+    def render_to(self, target, angle: float = 0, show_id: bool = False, seg_body_fill: str = None, seg_body_stroke: str = None, seg_border_stroke: str = None, seg_dir_fill: str = None, seg_dir_stroke: str = None, seg_id_fill: str = None, seg_id_stroke: str = None, seg_id_stroke_width: float = None, placement: Optional[Sequence[Sequence[float]]] = None) -> None:
+        # Without render cache the image is written while it is generated (Streaming)
+        if _config.render_cache:
+            _write_svg(lambda write: write(self._render(angle, show_id, seg_body_fill, seg_body_stroke, seg_border_stroke, seg_dir_fill, seg_dir_stroke, seg_id_fill, seg_id_stroke, seg_id_stroke_width, placement)), target)
+        else:
+            _write_svg(lambda write: self._write(write, angle, show_id, seg_body_fill, seg_body_stroke, seg_border_stroke, seg_dir_fill, seg_dir_stroke, seg_id_fill, seg_id_stroke, seg_id_stroke_width, placement), target)
+    
+    def plot(self, angle: float = 0, show_id: bool = False, seg_body_fill: str = None, seg_body_stroke: str = None, seg_border_stroke: str = None, seg_dir_fill: str = None, seg_dir_stroke: str = None, seg_id_fill: str = None, seg_id_stroke: str = None, seg_id_stroke_width: float = None, placement: Optional[Sequence[Sequence[float]]] = None) -> _TAssembly:
+        svg = self._render(angle, show_id, seg_body_fill, seg_body_stroke, seg_border_stroke, seg_dir_fill, seg_dir_stroke, seg_id_fill, seg_id_stroke, seg_id_stroke_width, placement)
+        
+        # Keep the plot arguments (Not the drawing) so the image can be saved later
+        self._plot_args = (angle, show_id, seg_body_fill, seg_body_stroke, seg_border_stroke, seg_dir_fill, seg_dir_stroke, seg_id_fill, seg_id_stroke, seg_id_stroke_width, placement)
+        
+        # Display the drawing
+        _display(svg)
+        
+        return self
+    
+    def save(self, name: str = 'Assembly.svg') -> None:
+        self.render_to(name, *getattr(self, '_plot_args', ()))
+    
     def export(self):
+        # The assembly is checked before creating the files
+        report = self.validate()
+        if not report['valid']:
+            raise ValueError('The assembly is not valid: ' + '; '.join(report['errors']))
+        
         _grp_track = _mk_track_dict(self)
         _grp_segment = _mk_seg_dict()
         _grp_shuttle = _mk_sh_dict()
@@ -612,7 +2048,7 @@ class Assembly(object):
         with open(_asm_cfg_file, 'wb') as f:
             f.write(b'<?xml version="1.0" encoding="utf-8"?>\n')
             f.write(b'<?AutomationStudio FileVersion="4.9"?>\n')
-            f.write(b'<?pyacptrak version="'+ bytes(version,'utf-8') + b'" author="Jorge Centeno"?>\n')
+            f.write(b'<?pyacptrak version="'+ bytes(_const('version'),'utf-8') + b'" author="Jorge Centeno"?>\n')
             f.write(_asm_cfg_tree.encode('utf-8'))
         
         print(f'{_asm_cfg_file} created successfully')
@@ -623,11 +2059,51 @@ class Assembly(object):
         with open(_sh_cfg_file, 'wb') as f:
             f.write(b'<?xml version="1.0" encoding="utf-8"?>\n')
             f.write(b'<?AutomationStudio FileVersion="4.9"?>\n')
-            f.write(b'<?pyacptrak version="'+ bytes(version,'utf-8') + b'" author="Jorge Centeno"?>\n')
+            f.write(b'<?pyacptrak version="'+ bytes(_const('version'),'utf-8') + b'" author="Jorge Centeno"?>\n')
             f.write(_sh_cfg_tree.encode('utf-8'))
         
         print(f'{_sh_cfg_file} created successfully')
 
+# Restore the global configuration of the parent process in each render worker
+def _render_init(config: Dict[str, any]) -> None:
+    _config.__dict__.update(config)
+    _typechecked.enabled = not _config.production
+
+# Render one job of render_many, if a path is given the image is written by the worker
+def _render_job(job) -> str:
+    item, kwargs, path = job
+    if path is None:
+        return item.to_svg(**kwargs)
+    item.render_to(path, **kwargs)
+    return path
+
+# Render the SVG image of several objects using a pool of processes, the results keep the order of the items
+@typechecked
+def render_many(items: Sequence, jobs: int = None, paths: Sequence[str] = None, **kwargs) -> List[str]:
+    if paths is not None and len(paths) != len(items):
+        raise ValueError('The number of paths must be equal to the number of items')
+    
+    # Each item could be an object or a tuple (object, plot arguments) that overrides the common arguments
+    job_list = []
+    for i, item in enumerate(items):
+        item, item_kwargs = item if isinstance(item, tuple) else (item, {})
+        if not hasattr(item, 'to_svg'):
+            raise TypeError('Only Segment, Track, Loop or Assembly objects can be rendered')
+        job_list.append((item, {**kwargs, **item_kwargs}, None if paths is None else paths[i]))
+    
+    jobs = (os.cpu_count() or 1) if jobs is None else jobs
+    if jobs < 1:
+        raise ValueError('The number of jobs must be at least 1')
+    
+    if jobs == 1 or len(job_list) < 2:
+        return [_render_job(job) for job in job_list]
+    
+    # The process pool is only imported when the images are rendered in parallel
+    from concurrent.futures import ProcessPoolExecutor
+    jobs = min(jobs, len(job_list))
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_render_init, initargs=(dict(_config.__dict__),)) as executor:
+        return list(executor.map(_render_job, job_list, chunksize=max(1, len(job_list) // (4*jobs))))
+
 # Controller parameter internal class for segment internal class
 class _control_par(object):
     def __init__(self):
@@ -842,6 +2318,17 @@ class _sh_stereotype_par(object):
     def __str__(self):
         return get_class_elements(self)
 
+# Model, extent (Front and back) [m] and width [m] of each shuttle size [mm], magnet plate (1 = Non diverter, 2 = Diverter) and magnet type
+_SHUTTLE_MODELS: Final = MappingProxyType({
+    (50, 1, 'straight'): ('8F1SA.102.xxxxxx-x', 0.025, 0.03),
+    (50, 2, 'straight'): ('8F1SA.100.xxxxxx-x', 0.025, 0.046),
+    (50, 1, 'skewed'): ('8F1SA.106.xxxxxx-x', 0.025, 0.03),
+    (50, 2, 'skewed'): ('8F1SA.104.xxxxxx-x', 0.025, 0.046),
+    (100, 1, 'straight'): ('8F1SA.203.xxxxxx-x', 0.05, 0.03),
+    (100, 2, 'straight'): ('8F1SA.201.xxxxxx-x', 0.05, 0.046),
+    (244, 1, 'straight'): ('8F1SB.308.xxxxxx-x', 0.122, 0.03),
+})
+
 # Shuttle internal class for parameter class
 class _Shuttle(object):
     def __init__(self):
@@ -905,51 +2392,17 @@ class _Shuttle(object):
         self._update_model()
     
     def _update_model(self):
-        if ((self.size == 50) and (self.magnet_plate == 1) and (self.magnet_type.lower() == 'straight')):
-            if self.auto_dimensions:
-                self.extent_front = 0.025
-                self.extent_back = 0.025
-                self.width = 0.03
-            self.model = '8F1SA.102.xxxxxx-x'
-        elif ((self._size == 50) and (self.magnet_plate == 2) and (self.magnet_type.lower() == 'straight')):
-            if self.auto_dimensions:
-                self.extent_front = 0.025
-                self.extent_back = 0.025
-                self.width = 0.046
-            self.model = '8F1SA.100.xxxxxx-x'
-        elif ((self._size == 50) and (self.magnet_plate == 1) and (self.magnet_type.lower() == 'skewed')):
-            if self.auto_dimensions:
-                self.extent_front = 0.025
-                self.extent_back = 0.025
-                self.width = 0.03
-            self.model = '8F1SA.106.xxxxxx-x'
-        elif ((self._size == 50) and (self.magnet_plate == 2) and (self.magnet_type.lower() == 'skewed')):
-            if self.auto_dimensions:
-                self.extent_front = 0.025
-                self.extent_back = 0.025
-                self.width = 0.046
-            self.model = '8F1SA.104.xxxxxx-x'
-        elif ((self._size == 100) and (self.magnet_plate == 1) and (self.magnet_type.lower() == 'straight')):
-            if self.auto_dimensions:
-                self.extent_front = 0.05
-                self.extent_back = 0.05
-                self.width = 0.03
-            self.model = '8F1SA.203.xxxxxx-x'
-        elif ((self._size == 100) and (self.magnet_plate == 2) and (self.magnet_type.lower() == 'straight')):
-            if self.auto_dimensions:
-                self.extent_front = 0.05
-                self.extent_back = 0.05
-                self.width = 0.046
-            self.model = '8F1SA.201.xxxxxx-x'
-        elif ((self._size == 244) and (self.magnet_plate == 1) and (self.magnet_type.lower() == 'straight')):
-            if self.auto_dimensions:
-                self.extent_front = 0.122
-                self.extent_back = 0.122
-                self.width = 0.03
-            self.model = '8F1SB.308.xxxxxx-x'
-        else:
+        key = (self._size, self.magnet_plate, self.magnet_type.lower())
+        if key not in _SHUTTLE_MODELS:
             raise ValueError(f'There is no shuttle with those characteristics size: {self._size}, magnetic plate: {self.magnet_plate}, magnet type {self.magnet_type}')
         
+        model, extent, width = _SHUTTLE_MODELS[key]
+        if self.auto_dimensions:
+            self.extent_front = extent
+            self.extent_back = extent
+            self.width = width
+        self.model = model
+        
         for callback in self._observers:
             callback(self.model)
         
@@ -961,6 +2414,11 @@ class _Shuttle(object):
     def bind_to(self, callback):
         self._observers.append(callback)
 
+# Track internal class for parameter class
+class _Track(object):
+    def __init__(self):
+        self.separation = 0.030
+
 # Visualization internal class for parameter class
 class _Visu(object):
     def __init__(self):
@@ -971,21 +2429,84 @@ class _Param(object):
     def __init__(self):
         self.shuttle = _Shuttle()
         self.segment = _Segment(self.shuttle)
+        self.track = _Track()
         self.visu = _Visu()
         
     def __str__(self):
         return get_class_elements(self)
     
-# Constant definition
-PARAM: Final = _Param()
-TRACK0: Final = Track([Segment('aa')])
-TRACK45: Final = Track([Segment('ab'), Segment('ba')])
-TRACK90: Final = Track([Segment('ab'), Segment('bb'), Segment('ba')])
-TRACK135: Final = Track([Segment('ab'), Segment('bb'), Segment('bb'), Segment('ba')])
-TRACK180: Final = Track([Segment('ab'), Segment('bb'), Segment('bb'), Segment('bb'), Segment('ba')])
+# Extent (Front and back) [m] of the shuttle sizes [mm]
+_SHUTTLE_EXTENT: Final = MappingProxyType({size: extent for (size, _, _), (_, extent, _) in _SHUTTLE_MODELS.items()})
+
+# Capacity and throughput of loops, all the arguments are broadcast together so many combinations are calculated in one call
+@_typechecked
+def loop_capacity(l, w, velocity = None, size = None, shuttle: Optional[_Shuttle] = None) -> Dict[str, np.ndarray]:
+    shuttle = _const('PARAM').shuttle if shuttle is None else shuttle
+    velocity = shuttle.stereotype_par.velocity if velocity is None else velocity
+    l, w, velocity, size = np.broadcast_arrays(np.asarray(l), np.asarray(w), np.asarray(velocity, dtype=float), np.asarray(-1 if size is None else size))
+    
+    if (l < 2).any() or (w < 1).any():
+        raise ValueError('The length of the loop must be at least 2 and the width at least 1')
+    if (velocity <= 0).any():
+        raise ValueError('The velocity must be greater than 0')
+    
+    # Length of the loops from the segment lengths: two 180° curves or four 90° curves and the straight segments
+    length = _seg_table()['length']
+    aa, ab, ba, bb = (length[_SEG_CODE[t]] for t in ('aa', 'ab', 'ba', 'bb'))
+    loop = np.where(w == 1, (2 * (ab + (3 * bb) + ba)) + (2 * (l - 2) * aa), (4 * (ab + bb + ba)) + (2 * (l + w - 4) * aa))
+    
+    # Space used by each shuttle [mm], the extents come from the shuttle size or from the shuttle parameters
+    sizes = np.array(sorted(_SHUTTLE_EXTENT))
+    known = (size == -1) | np.isin(size, sizes)
+    if not known.all():
+        raise ValueError(f'The shuttle size is not valid, please configure one of the following values: {list(sizes)}')
+    extent = np.where(size == -1, shuttle.extent_front + shuttle.extent_back, 2 * np.array([_SHUTTLE_EXTENT[k] for k in sizes.tolist()])[np.searchsorted(sizes, size)])
+    pitch = np.round((extent + shuttle.collision_distance) * 1000, 6)
+    capacity = (loop // pitch).astype(int)
+    lap_time = loop / (velocity * 1000)
+    
+    table = {
+        'l': l,
+        'w': w,
+        'size': np.where(size == -1, shuttle.size, size),
+        'velocity': velocity,
+        'length': loop,
+        'pitch': pitch,
+        'capacity': capacity,
+        'lap_time': lap_time,
+        'throughput': capacity * 3600 / lap_time,
+    }
+    return {k: np.asarray(v) for k, v in table.items()}
+
+# Constant definition, each constant is created on first access
+# The prebuilt tracks are shared by all the users of the module, their codes are read-only so they cannot be extended in place
+def _prebuilt(*types: str) -> Track:
+    track = Track([Segment(s) for s in types])
+    track._codes().flags.writeable = False
+    return track
+
+_LAZY_CONSTANTS: Final = {
+    'version': lambda: import_module('importlib.metadata').distribution('pyacptrak').version,
+    'PARAM': lambda: _Param(),
+    'TRACK0': lambda: _prebuilt('aa'),
+    'TRACK45': lambda: _prebuilt('ab', 'ba'),
+    'TRACK90': lambda: _prebuilt('ab', 'bb', 'ba'),
+    'TRACK135': lambda: _prebuilt('ab', 'bb', 'bb', 'ba'),
+    'TRACK180': lambda: _prebuilt('ab', 'bb', 'bb', 'bb', 'ba'),
+}
+
+def __getattr__(name: str):
+    if name in _LAZY_CONSTANTS:
+        value = globals()[name] = _LAZY_CONSTANTS[name]()
+        return value
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+def _const(name: str):
+    return globals()[name] if name in globals() else __getattr__(name)
 
 # Create track group dictionary
-def _mk_track_dict(asm: Assembly):
+def _mk_track_dict(asm: Assembly, param: Optional[_Track] = None):
+    param = _const('PARAM').track if param is None else param
     grp = []
     for i, track in enumerate(asm.track):
         if i < 1:
@@ -1081,14 +2602,15 @@ def _mk_track_dict(asm: Assembly):
                 '@ID': 'Tracks',
                     'Property': {
                         '@ID': 'TrackSeparation',
-                        '@Value': '0.030'
+                        '@Value': f'{param.separation:.3f}'
                     },
                     'Group': grp}
     return tracks
 
 # Create segment group dictionary
-@typechecked
-def _mk_seg_dict(param: _Segment = PARAM.segment):
+@_typechecked
+def _mk_seg_dict(param: Optional[_Segment] = None):
+    param = _const('PARAM').segment if param is None else param
     _simulation = ['off', 'on']
     _elongation = ['inactive', 'active']
     _stop_reaction = ['induction halt']
@@ -1220,7 +2742,8 @@ def _mk_seg_dict(param: _Segment = PARAM.segment):
                 }
             }
 
-def _mk_sh_stereotype(param: _Shuttle = PARAM.shuttle):
+def _mk_sh_stereotype(param: Optional[_Shuttle] = None):
+    param = _const('PARAM').shuttle if param is None else param
     return {
                     'Configuration': {
                         'Element': {
@@ -1312,8 +2835,9 @@ def _mk_sh_stereotype(param: _Shuttle = PARAM.shuttle):
                 }
 
 # Create shuttle group dictionary
-@typechecked
-def _mk_sh_dict(param: _Shuttle = PARAM.shuttle):
+@_typechecked
+def _mk_sh_dict(param: Optional[_Shuttle] = None):
+    param = _const('PARAM').shuttle if param is None else param
     _convoy = ['inactive', 'active']
     _collision_strategy = ['constant', 'variable', 'advanced constant', 'advanced variable']
     
@@ -1403,8 +2927,9 @@ def _mk_sh_dict(param: _Shuttle = PARAM.shuttle):
             }
 
 # Create visualization group dictionary
-@typechecked
-def _mk_visu_dict(param: _Visu = PARAM.visu):
+@_typechecked
+def _mk_visu_dict(param: Optional[_Visu] = None):
+    param = _const('PARAM').visu if param is None else param
     _task = [1, 2, 3, 4, 5, 6, 7, 8]
     
     if param.task not in _task:
@@ -1,2 +1,11 @@
 #__init__.py
-from pyacptrak.pyacptrak import *
\ No newline at end of file
+from pyacptrak import pyacptrak as _pyacptrak
+from pyacptrak.pyacptrak import *
+
+__all__ = _pyacptrak.__all__ + list(_pyacptrak._LAZY_CONSTANTS)
+
+# The version, PARAM and the prebuilt tracks are created on first access
+def __getattr__(name: str):
+    if name in _pyacptrak._LAZY_CONSTANTS:
+        return getattr(_pyacptrak, name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
\ No newline at end of file
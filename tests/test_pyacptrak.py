@@ -1,5 +1,53 @@
 from pyacptrak import *
+import io
+import os
+import numpy as np
 import pytest
+import subprocess
+import sys
+
+#Test import
+def test_lazy_import():
+	code = 'import sys, pyacptrak; print(sorted(m for m in ("numpy", "svgwrite", "xmltodict", "IPython", "concurrent.futures.process") if m in sys.modules))'
+	out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+	assert out.strip() == '[]'
+
+def test_import_time(tmp_path):
+	# Best of 3 runs of the cumulative import time [us] of the package (Budget of 150 ms), with the bytecode cached like an installed package
+	env = {k: v for k, v in os.environ.items() if k != 'PYTHONDONTWRITEBYTECODE'}
+	env['PYTHONPYCACHEPREFIX'] = str(tmp_path)
+	def import_time():
+		err = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import pyacptrak'], capture_output=True, text=True, check=True, env=env).stderr
+		return int([line for line in err.splitlines() if line.endswith('| pyacptrak')][0].split('|')[1])
+	import_time()
+	assert min(import_time() for _ in range(3)) < 150000
+
+def test_lazy_constants():
+	import pyacptrak
+	assert pyacptrak.TRACK90 is pyacptrak.TRACK90
+	assert isinstance(pyacptrak.version, str)
+	with pytest.raises(AttributeError):
+		pyacptrak.TRACK30
+
+def test_production_mode():
+	set_option('production', True)
+	try:
+		Segment('aa').to_svg(0, 'yes')
+		with pytest.raises(TypeError):
+			Track([Segment('aa'), 2])
+		with pytest.raises(AttributeError):
+			loop_capacity(3, 1, shuttle=5)
+	finally:
+		set_option('production', False)
+	with pytest.raises(TypeError):
+		Segment('aa').to_svg(0, 'yes')
+	with pytest.raises(TypeError):
+		loop_capacity(3, 1, shuttle=5)
+
+def test_production_env():
+	code = 'from pyacptrak import *; print(Loop(3,2).to_svg(0, "yes") == Loop(3,2).to_svg(0, True))'
+	out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True, env={**os.environ, 'PYACPTRAK_PRODUCTION': '1'}).stdout
+	assert out.strip() == 'True'
 
 #Test Segment
 def test_seg_input():
@@ -11,11 +59,19 @@ def test_seg_plot_1():
 		Segment('aa').plot('a')
 
 def test_seg_plot_2():
+	pytest.importorskip('IPython')
 	assert isinstance(Segment('aa').plot(20), Segment)
 
 def test_seg_add():
 	assert isinstance((Segment('aa') + Segment('aa')), Track)
 
+def test_seg_shared_geometry():
+	assert Segment('ab')._svg is Segment('AB')._svg
+	with pytest.raises(TypeError) as e_info:
+		Segment('aa')._svg['w'] = 1
+	with pytest.raises(AttributeError) as e_info:
+		Segment('aa').__dict__
+
 #Test Track
 def test_track_input_seg():
 	with pytest.raises(Exception) as e_info:
@@ -26,6 +82,7 @@ def test_track_plot_1():
 		Track([Segment('aa'), Segment('ab')]).plot('a')
 
 def test_track_plot_2():
+	pytest.importorskip('IPython')
 	assert isinstance(TRACK180.plot(20), Track)
 
 def test_track_add1():
@@ -34,6 +91,157 @@ def test_track_add1():
 def test_track_add2():
 	assert isinstance((TRACK45 + TRACK45), Track)
 
+def test_track_codes():
+	t = TRACK0 * 100000
+	assert t._codes().nbytes == 100000
+	assert t.segment[-1].name == 'gSeg_100000' and t.segment[-1].id == 100000
+	assert [s.name for s in Loop(3,1).segment[1:3]] == ['gSeg_002', 'gSeg_003']
+	assert [s._s for s in (Segment('bb') + TRACK45).segment] == ['bb', 'ab', 'ba']
+	with pytest.raises(IndexError):
+		TRACK0.segment[1]
+
+def test_track_extend():
+	t = Track([])
+	t2 = t
+	for i in range(1000):
+		t += Segment('aa')
+	assert t is t2 and len(t) == 1000 and t.length == 660000
+	t.extend(TRACK90, t)
+	assert len(t) == 2003 and [s._s for s in t.segment[999:1004]] == ['aa'] + [s._s for s in TRACK90.segment] + ['aa'] and t.length == 2 * 660000 + TRACK90.length
+	assert len(TRACK0) == 1
+	with pytest.raises(TypeError):
+		Loop(3,1).extend(TRACK0)
+	assert isinstance(Loop(3,1).__iadd__(TRACK0), Assembly)
+
+def test_track_validate():
+	assert all(t.validate()['valid'] for t in (TRACK0, TRACK45, TRACK90, TRACK135, TRACK180))
+	r = (TRACK180 * 2).validate()
+	assert r['valid'] and r['closed'] and r['heading'] == 360.0 and r['gap'] < 1e-6
+	r = (Segment('ab') + Segment('aa') + Segment('bb')).validate()
+	assert not r['valid'] and list(r['invalid']) == [0, 1] and 'Dangling end' in r['errors'][-1]
+	r = (TRACK90 * 2 + TRACK0 + TRACK90 * 2).validate()
+	assert not r['valid'] and r['closed'] and 'does not close' in r['errors'][0]
+
+def test_track_bbox():
+	xmin, ymin, xmax, ymax = TRACK90.bbox()
+	assert xmin == pytest.approx(0.492468) and xmax == pytest.approx(TRACK90.poses()['end_x'][-1])
+	box = Loop(4,2).bbox(30)
+	assert Loop(4,2).bbox(390) == box
+	svg = Loop(4,2).to_svg(30)
+	view = [float(v) for v in svg.split('viewBox="')[1].split('"')[0].split(',')]
+	assert view[0] <= box[0] and view[1] <= box[1] and (view[0] + view[2]) >= box[2] and (view[1] + view[3]) >= box[3]
+	with pytest.raises(ValueError):
+		Track([]).bbox()
+
+def test_track_extend_constant():
+	t = TRACK180
+	t += TRACK0
+	assert len(t) == 6 and t is not TRACK180
+	assert len(TRACK180) == 5 and Loop(4,1).length == 5880
+	with pytest.raises(TypeError):
+		TRACK90.extend(TRACK0)
+
+def test_track_from_segment_view():
+	t = Track(TRACK90.segment, 'gX_')
+	assert [s._s for s in t.segment] == ['ab', 'bb', 'ba'] and t.segment[0].name == 'gX_001'
+	assert Track(tuple(TRACK45.segment)).length == TRACK45.length
+	assert TRACK90.segment[np.int64(1)]._s == 'bb' and TRACK90.segment[np.int64(-1)].name == 'gSeg_003'
+	with pytest.raises(TypeError):
+		TRACK90.segment[1.0]
+
+def test_track_locate():
+	assert TRACK90.locate(TRACK90.length) == ('gSeg_003', 450.0)
+	with pytest.raises(ValueError):
+		TRACK90.locate(-1)
+
+def test_track_to_svg():
+	svg = TRACK90.to_svg(20, seg_body_fill='#ff8800')
+	assert svg.startswith('<svg') and 'gSeg_003' in svg and '#ff8800' in svg
+	assert not hasattr(TRACK90, '_dwg')
+
+def test_track_render_to():
+	buffer = io.BytesIO()
+	TRACK90.render_to(buffer, 20)
+	assert buffer.getvalue().decode('utf-8').endswith(TRACK90.to_svg(20))
+
+def test_track_pose_chunks():
+	track = Loop(5,3)
+	poses = track._poses(20)
+	chunks = list(track._pose_chunks(20, size=7))
+	assert len(chunks) == 3
+	assert all(list(np.concatenate([c[k] for c in chunks])) == list(poses[k]) for k in range(6))
+
+def test_track_svg_symbols():
+	set_option('svg_symbols', True)
+	try:
+		svg = Loop(3,1).to_svg(20, seg_body_fill='#123456')
+	finally:
+		set_option('svg_symbols', False)
+	assert svg.count('<symbol') == 4 and svg.count('<use') == 12
+	assert svg.count('#123456') == 8 and svg.count('<polygon') == 8
+
+def test_track_svg_precision():
+	set_option('svg_precision', 2)
+	set_option('svg_paths', True)
+	try:
+		svg = TRACK90.to_svg(20)
+	finally:
+		set_option('svg_precision', None)
+		set_option('svg_paths', False)
+	assert svg.count('<path') == 9 and '<polygon' not in svg
+	assert 'M0.25,0.49l5.54,0 5.55,0' in svg
+	assert 'translate(0.41,0.03) rotate(20.0)' in svg
+
+def test_track_svg_precision_id():
+	set_option('svg_precision', 1)
+	try:
+		svgs = []
+		for backend in ('string', 'svgwrite'):
+			set_option('svg_backend', backend)
+			svgs.append(TRACK90.to_svg(0, True))
+	finally:
+		set_option('svg_precision', None)
+		set_option('svg_backend', 'string')
+	assert all('x="22.3" y="6.3"' in svg and ',22.3, 6.3)' in svg and '6.2615' not in svg for svg in svgs)
+
+def test_track_svg_backend():
+	svg = {}
+	for backend in ('svgwrite', 'string'):
+		set_option('svg_backend', backend)
+		svg[backend] = Loop(4,2).to_svg(33, True, seg_id_fill='"&<') + Segment('ab').to_svg(12, True)
+	assert svg['string'] == svg['svgwrite']
+	with pytest.raises(Exception):
+		set_option('svg_backend', 'lxml')
+
+def test_track_poses():
+	p = TRACK180.poses(10)
+	assert len(p['x']) == len(TRACK180)
+	assert p['start_heading'][0] == 10
+	assert p['end_heading'][-1] == 190
+	assert list(p['start_heading'][1:]) == list(p['end_heading'][:-1])
+
+#Test render
+def test_render_many():
+	items = [TRACK0, (TRACK90, {'angle': 20}), Loop(3,1)]
+	assert render_many(items, jobs=2, show_id=True) == [TRACK0.to_svg(show_id=True), TRACK90.to_svg(20, True), Loop(3,1).to_svg(show_id=True)]
+
+def test_render_many_input():
+	with pytest.raises(Exception) as e_info:
+		render_many([TRACK0, 2])
+
+def test_render_cache():
+	set_option('render_cache', 8)
+	render_cache_clear()
+	try:
+		svg = Loop(3,1).to_svg(30, seg_body_fill='#ff8800')
+		assert Loop(3,1).to_svg(30, seg_body_fill='#ff8800') is svg
+		assert Loop(3,1).to_svg(30, seg_body_fill='#0000ff') is not svg
+		assert render_cache_info() == {'hits': 1, 'misses': 2, 'maxsize': 8, 'currsize': 2}
+		render_cache_clear()
+		assert render_cache_info()['currsize'] == 0
+	finally:
+		set_option('render_cache', 0)
+
 #Test Loop
 def test_loop_length_1():
 	assert Loop().info()['length'] == 3240
@@ -41,11 +249,112 @@ def test_loop_length_1():
 def test_loop_length_2():
 	assert Loop(3,3).info()['length'] == 7200
 
+def test_loop_length_3():
+	l = Loop(3,1)
+	assert l.length == l.info()['length'] == 4560
+	assert list(l._cumlen()[:2]) == [450, 690]
+	assert (l * 3).length == 3 * 4560
+
+def test_loop_locate():
+	l = Loop(3,1)
+	assert l.locate(500) == ('gSeg_002', 50.0)
+	assert l.locate(l.length + 500) == l.locate(500) == l.locate(500 - l.length)
+	names, offsets = l.locate(np.array([0, 449.5, 4559]))
+	assert list(names) == ['gSeg_001', 'gSeg_001', 'gSeg_012'] and list(offsets) == [0, 449.5, 659]
+
+def test_loop_to_xy():
+	l = Loop(3,2)
+	p = l.poses(30)
+	start = l.to_xy(0, 30)
+	assert start['x'] == pytest.approx(p['start_x'][0]) and start['y'] == pytest.approx(p['start_y'][0])
+	end = l.to_xy(l._cumlen() - 1e-9, 30)
+	assert np.allclose(end['x'], p['end_x']) and np.allclose(end['y'], p['end_y'])
+	assert np.allclose(end['heading'], p['end_heading'], atol=0.05)
+	by_name = l.to_xy([0, 10], segment=['gSeg_002', 'gSeg_003'])
+	by_index = l.to_xy([0, 10], segment=[1, 2])
+	assert np.allclose(by_name['x'], by_index['x']) and np.allclose(by_name['heading'], by_index['heading'])
+	for name in ('gLoop_002', 'gSeg_x02'):
+		with pytest.raises(ValueError):
+			l.to_xy(0, segment=name)
+	with pytest.raises(ValueError):
+		l.to_xy(-1, segment=0)
+	with pytest.raises(ValueError):
+		l.to_xy([0, 451], segment=[1, 1])
+
+def test_loop_template():
+	a, b = Loop(4,2), Loop(4,2, seg_prefix='gLoop_', seg_offset=10)
+	assert a._codes() is b._codes() and a._cumlen() is b._cumlen()
+	assert b.segment[0].name == 'gLoop_010' and a.segment[0].name == 'gSeg_001'
+	assert a.length == (TRACK90 * 4 + TRACK0 * 4).length
+	assert a.to_svg(30) == (TRACK90 + TRACK90 + TRACK0 * 2 + TRACK90 + TRACK90 + TRACK0 * 2).to_svg(30)
+	with pytest.raises(ValueError):
+		a._codes()[0] = 0
+
+def test_loop_validate():
+	assert all(Loop(l, w).validate()['valid'] for l in range(2, 8) for w in range(1, 5))
+	r = Loop(5000, 2).validate()
+	assert r['valid'] and r['gap'] < 1e-6
+
+def test_loop_simulate():
+	l = Loop(10,3)
+	r = l.simulate(20, count=20, record=0.5)
+	assert r['position'].shape == (41, 20) and r['time'][-1] == 20
+	assert r['clamps'] == 0 and np.allclose(r['velocity'][-1], PARAM.shuttle.stereotype_par.velocity)
+	pitch = (PARAM.shuttle.extent_front + PARAM.shuttle.extent_back + PARAM.shuttle.collision_distance) * 1000
+	r = l.simulate(20, count=300)
+	gaps = np.diff(np.sort(r['position'][-1]))
+	assert gaps.min() >= pitch - 0.01
+	with pytest.raises(ValueError):
+		l.simulate(1, count=1000)
+
+def test_track_simulate():
+	t = TRACK0 * 10
+	r = t.simulate(10, count=5)
+	pitch = (PARAM.shuttle.extent_front + PARAM.shuttle.extent_back + PARAM.shuttle.collision_distance) * 1000
+	assert r['position'][-1][-1] == pytest.approx(t.length, abs=0.1)
+	assert np.allclose(np.diff(r['position'][-1]), pitch, atol=0.1) and not r['velocity'][-1].any()
+
+def test_loop_simulate_long():
+	loop = Loop(10,3)
+	r = loop.simulate(1800, dt=0.1, record=1.0, count=7)
+	start = np.arange(7) * (loop.length / 7)
+	assert np.abs(r['position'][-1] - np.mod(start + r['distance'], loop.length)).max() < 0.01
+
+def test_loop_capacity():
+	r = loop_capacity([2, 3, 5], [1, 1, 3])
+	assert list(r['length']) == [Loop(2,1).length, Loop(3,1).length, Loop(5,3).length]
+	assert list(r['capacity']) == [62, 87, 189]
+	r = loop_capacity(np.arange(2, 12)[:, None], 2, velocity=[2.0, 4.0], size=100)
+	assert r['capacity'].shape == (10, 2) and (r['pitch'] == 102).all()
+	assert r['throughput'][0, 1] == pytest.approx(2 * r['throughput'][0, 0])
+	with pytest.raises(ValueError):
+		loop_capacity(3, 1, size=70)
+
+def test_loop_animate(tmp_path):
+	loop = Loop(3,1)
+	pos = loop.simulate(2, count=5)['position']
+	svg = loop.animate(pos, frame_time=0.1, show_id=False)
+	assert svg.startswith(loop.to_svg(show_id=False)[:-len('</svg>')])
+	assert svg.count('<use') == 5 and svg.count('repeatCount="indefinite"') == 10
+	paths = loop.animate(pos, str(tmp_path / 'f_{:03d}.svg'), mode='frames')
+	assert len(paths) == len(pos) and os.path.exists(paths[-1])
+	assert open(paths[0]).read().count('<use') == 5
+	with pytest.raises(ValueError):
+		loop.animate(pos, mode='gif')
+
+def test_loop_capacity_shuttle_sizes():
+	for size in (50, 100, 244):
+		shuttle = type(PARAM.shuttle)()
+		shuttle.magnet_plate = 1
+		shuttle.size = size
+		assert loop_capacity(3, 1, size=size)['pitch'] == loop_capacity(3, 1, shuttle=shuttle)['pitch']
+
 def test_loop_plot_1():
 	with pytest.raises(Exception) as e_info:
 		Loop(3,3).plot('a')
 
 def test_loop_plot_2():
+	pytest.importorskip('IPython')
 	assert isinstance(Loop(3,3).plot(20), Loop)
 
 def test_loop_add1():
@@ -60,3 +369,76 @@ def test_loop_add2():
 
 
 
+def test_assembly_to_svg():
+	asm = Loop(3,1) + Loop(4,2)
+	svg = asm.to_svg(show_id=True)
+	assert svg.count('<g ') == len(asm.track[0]) + len(asm.track[1])
+	assert 'id="gSeg_016"' in svg and '>16</text>' in svg
+	assert svg.count('<svg') == 1
+
+def test_assembly_placement():
+	asm = Loop(3,1) + Loop(3,1)
+	assert asm.to_svg(placement=[(0,0,0),(0,100,0)]) == asm.to_svg(placement=[(0,0,0),(0,100,360)])
+	assert asm.to_svg(placement=[(0,0,0),(0,100,0)]) != asm.to_svg()
+	with pytest.raises(ValueError):
+		asm.to_svg(placement=[(0,0,0)])
+
+def test_assembly_length():
+	asm = Loop(3,1) + Loop()
+	assert asm.length == asm.info()['length'] == asm.info(compact=True)['length'] == 4560 + 3240
+	assert asm.info()['track'][1]['length'] == 3240
+
+def test_assembly_locate():
+	asm = Loop(3,1, seg_prefix='gA_') + Loop(seg_prefix='gB_')
+	names, offsets = asm.locate([100, 4600])
+	assert list(names) == ['gA_001', 'gB_001'] and list(offsets) == [100, 40]
+	with pytest.raises(ValueError):
+		asm.locate(asm.length + 1)
+
+def test_assembly_simulate():
+	asm = Assembly([Loop(10,3)])
+	r = asm.simulate([(0, 1.0), (60, 4.0)], 3600, count=30)
+	assert r['station'][1]['capacity'] == 1 and r['station'][1]['utilization'] > 0.99
+	full = asm.simulate([(0, 1.0), (60, 4.0)], 100, count=317)
+	assert [st['capacity'] for st in full['station']] == [314, 1] and all(st['queue_max'] <= st['capacity'] for st in full['station'])
+	with pytest.raises(ValueError):
+		asm.simulate([(0, 1.0), (60, 4.0)], 100, count=318)
+	assert r['station'][0]['blocked'] > 0.5
+	assert 850 < r['throughput'] < 900
+	with pytest.raises(ValueError):
+		asm.simulate([(60, 1.0), (0, 1.0)], 10)
+
+def test_assembly_bbox():
+	asm = Assembly([Loop(3,2), TRACK90])
+	assert asm.bbox(placement=[(0, 0, 0), (500, 0, 0)]) == pytest.approx((*Loop(3,2).bbox()[:2], 500 + TRACK90.bbox()[2], Loop(3,2).bbox()[3]))
+	box = asm.bbox()
+	view = [float(v) for v in asm.to_svg().split('viewBox="')[1].split('"')[0].split(',')]
+	assert view[0] <= box[0] and view[1] <= box[1] and (view[0] + view[2]) >= box[2] and (view[1] + view[3]) >= box[3]
+	assert (box[3] - box[1]) > (Loop(3,2).bbox()[3] - Loop(3,2).bbox()[1]) + 10.0
+
+def test_assembly_overlaps():
+	asm = Assembly([Loop(3,2), Loop(3,2)])
+	assert asm.overlaps() == [] and Assembly([Loop(l, w) for l in range(2, 6) for w in range(1, 4)]).overlaps() == []
+	r = asm.overlaps(placement=[(0, 0, 0), (0, 0, 0)])
+	assert ('gSeg_001', 'gSeg_015', 0.0) in r and all(d < 30 for _, _, d in r)
+	h = Loop(3,2).bbox()[3] - Loop(3,2).bbox()[1]
+	assert [d for _, _, d in asm.overlaps(placement=[(0, 0, 0), (0, h + 1, 0)])] and min(d for _, _, d in asm.overlaps(placement=[(0, 0, 0), (0, h + 1, 0)])) == pytest.approx(10.0)
+	assert asm.overlaps(placement=[(0, 0, 0), (0, h + 5, 0)]) == []
+	assert asm.overlaps(placement=[(0, 0, 0), (0, h + 5, 0)], separation=0.06) != []
+	r0 = asm.overlaps(placement=[(0, 0, 0), (0, 0, 0)], separation=0)
+	assert r0 and r0 == [p for p in r if p[2] == 0.0]
+
+def test_assembly_validate(tmp_path, monkeypatch):
+	assert Assembly([Loop(3,2), TRACK90]).validate()['valid']
+	r = Assembly([Loop(3,2), TRACK90 + Segment('ab')]).validate()
+	assert not r['valid'] and r['errors'][0].startswith('Track 2:')
+	monkeypatch.chdir(tmp_path)
+	with pytest.raises(ValueError):
+		Assembly([TRACK90 * 2 + TRACK0 + TRACK90 * 2]).export()
+	assert not os.listdir(tmp_path)
+	PARAM.track.separation = 0.05
+	try:
+		Assembly([Loop(3,2)]).export()
+	finally:
+		PARAM.track.separation = 0.030
+	assert 'TrackSeparation" Value="0.050"' in open(tmp_path / 'AsmCfg.assembly').read()